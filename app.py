@@ -1,11 +1,39 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, g, has_request_context, stream_with_context
+from flask.cli import AppGroup
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy.orm import backref
-from datetime import datetime
+import click
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import backref, joinedload
+from datetime import datetime, timedelta
+import base64
+import binascii
+import csv
+import gzip
+import hashlib
+import io
+import json
 import os
 import secrets
+import sqlite3
 import string
-from functools import wraps
+import threading
+import time
+from collections import Counter
+from functools import lru_cache, wraps
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+import assets
+import cache_backends
+import json_provider
+import log_setup
+import metrics
+import migrations
 
 app = Flask(__name__)
 # Runtime config for Railway: read from env with safe fallbacks
@@ -17,7 +45,115 @@ if db_url.startswith('postgres://'):
 app.config['SQLALCHEMY_DATABASE_URI'] = db_url
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db = SQLAlchemy(app)
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+
+# Connection pooling: 2 gunicorn workers x 4 threads plus background job threads.
+# SQLite gets its tuning from PRAGMAs on connect instead (see _sqlite_pragmas).
+# TimedQueuePool reports checkout waits to /metrics (in-memory SQLite keeps
+# Flask-SQLAlchemy's StaticPool).
+def _engine_options(url):
+    if url.startswith('sqlite'):
+        options = {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+        if url not in ('sqlite://', 'sqlite:///:memory:'):
+            options['poolclass'] = metrics.TimedQueuePool
+        return options
+    return {
+        'poolclass': metrics.TimedQueuePool,
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': True,
+    }
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = _engine_options(db_url)
+# Expose the per-request SQL statement count as X-Query-Count (for tests/debugging)
+app.config['QUERY_COUNT_HEADER'] = os.getenv('QUERY_COUNT_HEADER', '0') == '1'
+# Public news responses: 'memory' is per process; 'filesystem' is shared by all
+# gunicorn workers, so an edit in one worker invalidates the others too
+app.config['NEWS_CACHE_BACKEND'] = os.getenv('NEWS_CACHE_BACKEND', 'memory')
+app.config['NEWS_CACHE_DIR'] = os.getenv('NEWS_CACHE_DIR')  # default: <instance>/news_cache
+app.config['NEWS_CACHE_TTL'] = int(os.getenv('NEWS_CACHE_TTL', '300'))  # seconds
+app.config['NEWS_MAX_AGE'] = int(os.getenv('NEWS_MAX_AGE', '0'))  # browser freshness, seconds
+# 'orjson' (used when installed) or 'json' for the stock Flask encoder
+app.config['JSON_PROVIDER'] = os.getenv('JSON_PROVIDER', 'orjson')
+# Compress API/HTML responses at least this many bytes long (0 disables)
+app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+# /metrics (Prometheus text format), summed over all workers via METRICS_DIR
+app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', '1') == '1'
+app.config['METRICS_DIR'] = os.getenv('METRICS_DIR')  # default: <instance>/metrics
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')  # scrapes need "Authorization: Bearer <token>"
+# Serve /metrics without a token (only when it isn't reachable from outside);
+# with neither set the endpoint answers 404 while metrics are still collected
+app.config['METRICS_PUBLIC'] = os.getenv('METRICS_PUBLIC', '0') == '1'
+# Log statements slower than this many ms, with their route (unset: off)
+app.config['SLOW_QUERY_MS'] = float(os.environ['SLOW_QUERY_MS']) if os.getenv('SLOW_QUERY_MS') else None
+# Tasks, assignments and notifications sent to a group: 'copy' writes one row
+# per member in a background job; 'shared' stores a single row for the group
+# that members read through GroupMember (per-member read flags: GroupItemState)
+app.config['GROUP_ITEMS'] = os.getenv('GROUP_ITEMS', 'copy')
+
+# Bound to the app at import (_init_extensions, end of module); binding never
+# touches the database
+db = SQLAlchemy()
+
+# Per-request query counter: every statement executed while handling a request
+# increments g.query_count, so N+1 regressions show up as a growing count.
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+# WAL lets readers run alongside the single writer; synchronous=NORMAL is safe
+# with WAL and avoids an fsync per commit; busy_timeout makes writers wait
+# for the lock instead of failing with "database is locked".
+@event.listens_for(Engine, 'connect')
+def _sqlite_pragmas(dbapi_conn, connection_record):
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cursor = dbapi_conn.cursor()
+    cursor.execute(f'PRAGMA journal_mode={SQLITE_JOURNAL_MODE}')
+    cursor.execute(f'PRAGMA synchronous={SQLITE_SYNCHRONOUS}')
+    cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+    cursor.close()
+
+@app.after_request
+def _add_query_count_header(response):
+    if app.config['QUERY_COUNT_HEADER']:
+        response.headers['X-Query-Count'] = str(g.get('query_count', 0))
+    return response
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/csv'}
+
+@app.after_request
+def _compress_response(response):
+    # Static files carry their own precompressed variants; streams (SSE,
+    # exports) are left alone so every chunk reaches the client immediately
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    if (not min_size or response.status_code != 200 or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    if brotli is not None and request.accept_encodings['br']:
+        encoding, compress = 'br', lambda b: brotli.compress(b, quality=4)
+    elif request.accept_encodings['gzip']:
+        encoding, compress = 'gzip', lambda b: gzip.compress(b, compresslevel=6)
+    else:
+        return response
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+    response.set_data(compress(body))
+    response.headers['Content-Encoding'] = encoding
+    # The compressed bytes are a different representation; a weak ETag still
+    # revalidates (If-None-Match uses weak comparison)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
 
 # Admin credentials (change in production!)
 ADMIN_USERNAME = os.getenv('ADMIN_USERNAME', 'admin')
@@ -34,6 +170,11 @@ def login_required(f):
 
 # Models
 class Recruitment(db.Model):
+    __table_args__ = (
+        db.Index('ix_recruitment_submission_date_id', 'submission_date', 'id'),
+        db.Index('ix_recruitment_status_submission_date_id', 'status', 'submission_date', 'id'),
+        db.Index('uq_recruitment_idempotency_key', 'idempotency_key', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     last_name = db.Column(db.String(100), nullable=False)
     first_name = db.Column(db.String(100), nullable=False)
@@ -60,6 +201,10 @@ class Recruitment(db.Model):
     additional_info = db.Column(db.Text)
     status = db.Column(db.String(50), default='На рассмотрении')
     submission_date = db.Column(db.DateTime, default=datetime.utcnow)
+    # Client-supplied Idempotency-Key: retries of one submission map to one row
+    idempotency_key = db.Column(db.String(64))
+    # SHA-256 of the submitted payload: a key is only replayed for the same data
+    idempotency_fingerprint = db.Column(db.String(64))
     
     def to_dict(self):
         user_info = None
@@ -103,6 +248,10 @@ class Recruitment(db.Model):
         }
 
 class News(db.Model):
+    __table_args__ = (
+        db.Index('ix_news_date_id', 'date', 'id'),
+        db.Index('ix_news_category_date_id', 'category', 'date', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
@@ -127,13 +276,22 @@ class User(db.Model):
     password = db.Column(db.String(200), nullable=False)
     rank = db.Column(db.String(50))
     created_date = db.Column(db.DateTime, default=datetime.utcnow)
+    # Denormalized count of unread Notification rows, kept in step by every writer
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     recruitment = db.relationship('Recruitment', backref=backref('user_account', uselist=False))
 
 # New models for user panel
+# Tasks, assignments and notifications belong either to one user (user_id) or,
+# stored once, to a whole group (group_id, user_id NULL); see GROUP_ITEMS
 class CombatTask(db.Model):
+    __table_args__ = (
+        db.Index('ix_combat_task_user_id_id', 'user_id', 'id'),
+        db.Index('ix_combat_task_group_id_id', 'group_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'))
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     status = db.Column(db.String(50), default='new')  # new, in_progress, done
@@ -142,8 +300,13 @@ class CombatTask(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class Assignment(db.Model):
+    __table_args__ = (
+        db.Index('ix_assignment_user_id_id', 'user_id', 'id'),
+        db.Index('ix_assignment_group_id_id', 'group_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'))
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     issued_by = db.Column(db.String(100))
@@ -151,13 +314,20 @@ class Assignment(db.Model):
     status = db.Column(db.String(50), default='assigned')
 
 class Notification(db.Model):
+    __table_args__ = (
+        db.Index('ix_notification_user_id_id', 'user_id', 'id'),
+        db.Index('ix_notification_user_id_is_read', 'user_id', 'is_read'),
+        db.Index('ix_notification_group_id_id', 'group_id', 'id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'))
     content = db.Column(db.Text, nullable=False)
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class DaySchedule(db.Model):
+    __table_args__ = (db.Index('ix_day_schedule_user_id', 'user_id'),)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     day = db.Column(db.String(20), nullable=False)  # e.g. Monday
@@ -175,11 +345,95 @@ class Group(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 class GroupMember(db.Model):
+    __table_args__ = (
+        db.Index('uq_group_member_group_user', 'group_id', 'user_id', unique=True),
+        db.Index('ix_group_member_user_id', 'user_id'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     added_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+# Group schedules are stored once per group and day; members read them through
+# GroupMember at request time, with an optional sparse per-user override row.
+# DaySchedule keeps schedules set for a single user.
+class ScheduleTemplate(db.Model):
+    __table_args__ = (db.Index('ix_schedule_template_group_id_id', 'group_id', 'id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
+    day = db.Column(db.String(20), nullable=False)
+    wake_up = db.Column(db.String(20))
+    training = db.Column(db.String(50))
+    duty = db.Column(db.String(50))
+    rest = db.Column(db.String(50))
+    lights_out = db.Column(db.String(20))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ScheduleOverride(db.Model):
+    """Per-user changes to a template; NULL fields fall back to the template."""
+    __table_args__ = (
+        db.Index('uq_schedule_override_template_user', 'template_id', 'user_id', unique=True),
+        db.Index('ix_schedule_override_user_id', 'user_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    template_id = db.Column(db.Integer, db.ForeignKey('schedule_template.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    wake_up = db.Column(db.String(20))
+    training = db.Column(db.String(50))
+    duty = db.Column(db.String(50))
+    rest = db.Column(db.String(50))
+    lights_out = db.Column(db.String(20))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+SCHEDULE_FIELDS = ('wake_up', 'training', 'duty', 'rest', 'lights_out')
+
+class GroupItemState(db.Model):
+    """A member's own state for an item stored once for their group.
+
+    Sparse: a row exists only once the member changed something (so far, read
+    a notification); otherwise the item's own values apply.
+    """
+    __table_args__ = (
+        db.Index('uq_group_item_state_item_user', 'item_type', 'item_id', 'user_id', unique=True),
+        db.Index('ix_group_item_state_user_id', 'user_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    item_type = db.Column(db.String(20), nullable=False)  # see GROUP_ITEM_TYPES
+    item_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    is_read = db.Column(db.Boolean)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+# Models that can hold group rows -> GroupItemState.item_type
+GROUP_ITEM_TYPES = {CombatTask: 'task', Assignment: 'assignment', Notification: 'notification'}
+
+# Background jobs (group fan-out); the table is the queue, shared by all workers
+class Job(db.Model):
+    __table_args__ = (db.Index('ix_job_status_id', 'status', 'id'),)
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)  # task, assignment, schedule, notification
+    payload = db.Column(db.Text, nullable=False)  # JSON request body
+    status = db.Column(db.String(20), default='queued')  # queued, running, done, failed
+    total = db.Column(db.Integer, default=0)
+    done = db.Column(db.Integer, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'total': self.total,
+            'done': self.done,
+            'created_for': self.done if self.status == 'done' else None,
+            'error': self.error,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
+        }
+
 # Routes
 @app.route('/')
 def index():
@@ -220,84 +474,616 @@ def user_logout():
 def user_dashboard():
     uid = session.get('user_id')
     user = User.query.get(uid) if uid else None
-    return render_template('user_dashboard.html', current_user=user)
+    return render_template('user_dashboard.html', current_user=user, page_size=USER_LIST_PAGE_SIZE)
 
 # -------- User APIs (scoped to current user) --------
 def current_user_id():
     return session.get('user_id')
 
+def _task_dict(t):
+    return {
+        'id': t.id,
+        'title': t.title,
+        'description': t.description,
+        'status': t.status,
+        'priority': t.priority,
+        'due_date': t.due_date,
+        'created_at': t.created_at.strftime('%Y-%m-%d %H:%M')
+    }
+
+def _assignment_dict(a):
+    return {
+        'id': a.id,
+        'title': a.title,
+        'description': a.description,
+        'issued_by': a.issued_by,
+        'status': a.status,
+        'created_at': a.created_at.strftime('%Y-%m-%d %H:%M')
+    }
+
+def _notification_dict(n):
+    return {
+        'id': n.id,
+        'content': n.content,
+        'is_read': n.is_read,
+        'created_at': n.created_at.strftime('%Y-%m-%d %H:%M')
+    }
+
+def _schedule_dict(s):
+    return {
+        'id': s.id,
+        'day': s.day,
+        'wake_up': s.wake_up,
+        'training': s.training,
+        'duty': s.duty,
+        'rest': s.rest,
+        'lights_out': s.lights_out
+    }
+
+USER_LIST_PAGE_SIZE = 50
+USER_LIST_MAX_PAGE_SIZE = 200
+
+# The user panel's statements are built once, with the user id left as the
+# `uid` bind parameter: constructing these expression trees on every request
+# cost more CPU than running them
+UID = db.bindparam('uid')
+
+def _user_groups(uid=UID):
+    return db.select(GroupMember.group_id).where(GroupMember.user_id == uid)
+
+@lru_cache(maxsize=None)
+def _user_groups_stmt():
+    return _user_groups().order_by(GroupMember.group_id)
+
+def _user_group_ids(uid):
+    return db.session.execute(_user_groups_stmt(), {'uid': uid}).scalars().all()
+
+def _visible_branches(model, uid=UID):
+    """Filters for the user's `model` rows: rows addressed to them and, for
+    models with shared group rows, rows stored once for one of their groups.
+
+    The branches are aggregated separately, each on its own (owner, id)
+    index: an OR of the two makes SQLite merge both index ranges.
+    """
+    if model not in GROUP_ITEM_TYPES:
+        return (model.user_id == uid,)
+    return (model.user_id == uid, model.group_id.in_(_user_groups(uid)))
+
+def _user_rows(model):
+    """Select of (row, is_read) over `model`, without a visibility filter.
+
+    `is_read` is the user's own flag from GroupItemState for shared group
+    notifications they have read, else None (the row's values apply).
+    """
+    if model is not Notification:
+        return db.select(model, db.null())
+    return (db.select(model, GroupItemState.is_read)
+            .outerjoin(GroupItemState, (GroupItemState.item_type == GROUP_ITEM_TYPES[model])
+                       & (GroupItemState.item_id == model.id)
+                       & (GroupItemState.user_id == UID)))
+
+@lru_cache(maxsize=None)
+def _user_page_stmt(model, ascending, since, before, groups=0):
+    """Select of one page of the user's (row, is_read) pairs; execute with
+    {'uid', 'limit'}, {'group_<n>'} for each of `groups` group ids and, when
+    flagged, {'since'} / {'before'} ids.
+
+    The user's own rows and each group's shared rows are separate branches,
+    each ordered and limited on its own (owner, id) index; the union is at
+    most (groups + 1) * limit ids and _user_page puts the rows back in order.
+    A `group_id IN (...)` branch would make SQLite sort all the groups' rows.
+    """
+    order = model.id.asc() if ascending else model.id.desc()
+    limit = db.bindparam('limit', type_=db.Integer)
+    ranges = ([model.id > db.bindparam('since', type_=db.Integer)] if since else []) + (
+        [model.id < db.bindparam('before', type_=db.Integer)] if before else [])
+    branches = [model.user_id == UID] + [
+        model.group_id == db.bindparam(f'group_{n}', type_=db.Integer) for n in range(groups)
+    ]
+    if len(branches) == 1:
+        return _user_rows(model).where(branches[0], *ranges).order_by(order).limit(limit)
+    ids = [
+        db.select(db.select(model.id).where(visible, *ranges).order_by(order).limit(limit).subquery().c.id)
+        for visible in branches
+    ]
+    return _user_rows(model).where(model.id.in_(db.union_all(*ids)))
+
+def _user_page(model, uid, limit, groups, since=None, before=None, ascending=False):
+    """Up to `limit` of the user's (row, is_read) pairs, newest first unless
+    `ascending`, with ids above `since` and below `before`. `groups` are the
+    user's group ids (_user_group_ids), read once by the caller."""
+    groups = groups if model in GROUP_ITEM_TYPES else ()
+    stmt = _user_page_stmt(model, ascending, since is not None, before is not None, len(groups))
+    params = {'uid': uid, 'limit': limit, 'since': since, 'before': before}
+    params.update((f'group_{n}', group_id) for n, group_id in enumerate(groups))
+    rows = db.session.execute(stmt, params).all()
+    rows.sort(key=lambda row: row[0].id, reverse=not ascending)
+    return rows[:limit]
+
+def _with_state(data, is_read):
+    if is_read is not None:
+        data['is_read'] = is_read
+    return data
+
+def _user_list(model, uid):
+    """Newest-first page of the user's `model` rows.
+
+    `since=<id>` returns only rows newer than that id; the page is taken
+    from the oldest end, so polling with the newest seen id never skips
+    rows. `before=<id>` pages back through history. Page size is `limit`.
+    """
+    limit = _page_size_arg(USER_LIST_PAGE_SIZE, USER_LIST_MAX_PAGE_SIZE)
+    since = request.args.get('since', type=int)
+    before = request.args.get('before', type=int)
+    groups = _user_group_ids(uid) if model in GROUP_ITEM_TYPES else ()
+    if since is not None:
+        return _user_page(model, uid, limit, groups, since=since, before=before, ascending=True)[::-1]
+    return _user_page(model, uid, limit, groups, before=before)
+
 @app.route('/api/user/tasks', methods=['GET'])
 @user_login_required
 def api_user_tasks():
     uid = current_user_id()
-    tasks = CombatTask.query.filter_by(user_id=uid).order_by(CombatTask.created_at.desc()).all()
-    return jsonify([
-        {
-            'id': t.id,
-            'title': t.title,
-            'description': t.description,
-            'status': t.status,
-            'priority': t.priority,
-            'due_date': t.due_date,
-            'created_at': t.created_at.strftime('%Y-%m-%d %H:%M')
-        } for t in tasks
-    ])
+    tasks = _user_list(CombatTask, uid)
+    return jsonify([_task_dict(t) for t, _ in tasks])
 
 @app.route('/api/user/assignments', methods=['GET'])
 @user_login_required
 def api_user_assignments():
     uid = current_user_id()
-    items = Assignment.query.filter_by(user_id=uid).order_by(Assignment.created_at.desc()).all()
-    return jsonify([
-        {
-            'id': a.id,
-            'title': a.title,
-            'description': a.description,
-            'issued_by': a.issued_by,
-            'status': a.status,
-            'created_at': a.created_at.strftime('%Y-%m-%d %H:%M')
-        } for a in items
-    ])
+    items = _user_list(Assignment, uid)
+    return jsonify([_assignment_dict(a) for a, _ in items])
 
 @app.route('/api/user/notifications', methods=['GET'])
 @user_login_required
 def api_user_notifications():
     uid = current_user_id()
-    items = Notification.query.filter_by(user_id=uid).order_by(Notification.created_at.desc()).all()
-    return jsonify([
-        {
-            'id': n.id,
-            'content': n.content,
-            'is_read': n.is_read,
-            'created_at': n.created_at.strftime('%Y-%m-%d %H:%M')
-        } for n in items
-    ])
+    items = _user_list(Notification, uid)
+    return jsonify([_with_state(_notification_dict(n), is_read) for n, is_read in items])
+
+def _adjust_unread(user_ids, delta):
+    """Add `delta` to each user's unread counter once per occurrence in `user_ids`."""
+    by_count = {}
+    for uid, n in Counter(user_ids).items():
+        by_count.setdefault(n, []).append(uid)
+    for n, ids in by_count.items():
+        db.session.execute(
+            db.update(User)
+            .where(User.id.in_(ids))
+            .values(unread_notifications=User.unread_notifications + n * delta)
+            .execution_options(synchronize_session=False)
+        )
+
+def _group_unread(group_id, user_id):
+    """Scalar subquery: shared notifications of `group_id` that `user_id`
+    (a value or a correlated column) has not read.
+
+    Correlation is explicit: the read-state EXISTS sits two levels below
+    the UPDATE of `user`, where auto-correlation would not reach.
+    """
+    read = db.select(GroupItemState.id).where(
+        GroupItemState.item_type == GROUP_ITEM_TYPES[Notification],
+        GroupItemState.item_id == Notification.id,
+        GroupItemState.user_id == user_id,
+        GroupItemState.is_read.is_(True),
+    ).correlate_except(GroupItemState)
+    return (db.select(func.count(Notification.id))
+            .where(Notification.group_id == group_id, ~read.exists())
+            .correlate_except(Notification)
+            .scalar_subquery())
+
+def _adjust_group_unread(group_id, user_ids, sign):
+    """Add (sign=1) or take off (-1) the group's unread shared notifications
+    to/from the counters of `user_ids` (a list or a select of ids); for
+    members joining or leaving the group."""
+    db.session.execute(
+        db.update(User)
+        .where(User.id.in_(user_ids))
+        .values(unread_notifications=User.unread_notifications + sign * _group_unread(group_id, User.id))
+        .execution_options(synchronize_session=False)
+    )
+
+def _unread_count(uid):
+    return db.session.query(User.unread_notifications).filter_by(id=uid).scalar() or 0
+
+@app.route('/api/user/notifications/unread-count', methods=['GET'])
+@user_login_required
+def api_user_unread_count():
+    return jsonify({'unread': _unread_count(current_user_id())})
+
+@app.route('/api/user/notifications/<int:notification_id>/read', methods=['POST'])
+@user_login_required
+def api_user_mark_notification_read(notification_id):
+    uid = current_user_id()
+    updated = db.session.execute(
+        db.update(Notification)
+        .where(Notification.id == notification_id, Notification.user_id == uid, Notification.is_read.is_(False))
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        updated = _mark_group_notification_read(notification_id, uid)
+    if updated:
+        _adjust_unread([uid], -1)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent request recorded the same read first
+        db.session.rollback()
+    return jsonify({'success': True, 'unread': _unread_count(uid)})
+
+def _mark_group_notification_read(notification_id, uid):
+    """Record that the user read a shared group notification; True if it was unread."""
+    visible = db.session.query(Notification.id).filter(
+        Notification.id == notification_id, Notification.group_id.in_(_user_groups(uid))
+    ).scalar()
+    if visible is None:
+        return False
+    item_type = GROUP_ITEM_TYPES[Notification]
+    state = GroupItemState.query.filter_by(item_type=item_type, item_id=notification_id, user_id=uid).first()
+    if state is None:
+        db.session.add(GroupItemState(item_type=item_type, item_id=notification_id, user_id=uid, is_read=True))
+        return True
+    if state.is_read:
+        return False
+    state.is_read = True
+    return True
+
+@app.route('/api/user/notifications/read-all', methods=['POST'])
+@user_login_required
+def api_user_mark_all_notifications_read():
+    """Mark everything read; the counter drops by the rows actually marked,
+    so a fan-out chunk committed meanwhile stays counted as unread."""
+    uid = current_user_id()
+    marked = db.session.execute(
+        db.update(Notification)
+        .where(Notification.user_id == uid, Notification.is_read.is_(False))
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    # Shared group notifications: one state row per notification not yet
+    # marked, inserted by a single INSERT ... SELECT
+    item_type = GROUP_ITEM_TYPES[Notification]
+    mine = db.select(GroupItemState.id).where(
+        GroupItemState.item_type == item_type,
+        GroupItemState.item_id == Notification.id,
+        GroupItemState.user_id == uid,
+    )
+    marked += db.session.execute(
+        db.update(GroupItemState)
+        .where(GroupItemState.item_type == item_type, GroupItemState.user_id == uid,
+               db.or_(GroupItemState.is_read.is_(None), GroupItemState.is_read.is_(False)))
+        .values(is_read=True, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    marked += db.session.execute(
+        db.insert(GroupItemState).from_select(
+            ['item_type', 'item_id', 'user_id', 'is_read', 'updated_at'],
+            db.select(
+                db.literal(item_type), Notification.id, db.literal(uid), db.true(),
+                db.literal(datetime.utcnow(), db.DateTime),
+            ).where(Notification.group_id.in_(_user_groups(uid)), ~mine.exists()),
+        )
+    ).rowcount
+    if marked:
+        _adjust_unread([uid], -marked)
+    unread = db.session.scalar(db.select(User.unread_notifications).where(User.id == uid))
+    db.session.commit()
+    return jsonify({'success': True, 'unread': unread})
+
+@lru_cache(maxsize=None)
+def _user_schedule_stmt():
+    no_id = db.cast(db.null(), db.Integer)
+    personal = db.select(
+        DaySchedule.id, no_id.label('template_id'), DaySchedule.day,
+        *(getattr(DaySchedule, f) for f in SCHEDULE_FIELDS),
+    ).where(DaySchedule.user_id == UID)
+    shared = (
+        db.select(
+            no_id, ScheduleTemplate.id, ScheduleTemplate.day,
+            *(func.coalesce(getattr(ScheduleOverride, f), getattr(ScheduleTemplate, f)) for f in SCHEDULE_FIELDS),
+        )
+        .join(GroupMember, (GroupMember.group_id == ScheduleTemplate.group_id) & (GroupMember.user_id == UID))
+        .outerjoin(ScheduleOverride, (ScheduleOverride.template_id == ScheduleTemplate.id) & (ScheduleOverride.user_id == UID))
+    )
+    return db.union_all(personal, shared)
+
+def _user_schedule(uid):
+    """The user's personal DaySchedule rows, then their groups' templates with
+    any override fields laid over them, in one statement.
+
+    Template items have `template_id` set and `id` None; personal rows the
+    reverse (their ids are what the live-updates cursor tracks).
+    """
+    rows = db.session.execute(_user_schedule_stmt(), {'uid': uid}).all()
+    rows.sort(key=lambda r: (r.id is None, r.id or r.template_id))
+    return [
+        {'id': r.id, 'template_id': r.template_id, 'day': r.day, **{f: getattr(r, f) for f in SCHEDULE_FIELDS}}
+        for r in rows
+    ]
+
+def _shared_schedule_aggregates(uid=UID):
+    """Scalar subqueries that change whenever the user's resolved group
+    schedule does: a template edited, added or removed, an override written,
+    or the user joining/leaving a group that has templates."""
+    reachable = ScheduleTemplate.group_id.in_(db.select(GroupMember.group_id).where(GroupMember.user_id == uid))
+    mine = ScheduleOverride.user_id == uid
+    return [
+        db.select(func.count(ScheduleTemplate.id)).where(reachable).scalar_subquery(),
+        db.select(func.sum(ScheduleTemplate.id)).where(reachable).scalar_subquery(),
+        db.select(func.max(ScheduleTemplate.updated_at)).where(reachable).scalar_subquery(),
+        db.select(func.count(ScheduleOverride.id)).where(mine).scalar_subquery(),
+        db.select(func.max(ScheduleOverride.updated_at)).where(mine).scalar_subquery(),
+    ]
+
+@lru_cache(maxsize=None)
+def _shared_schedule_version_stmt():
+    return db.select(*_shared_schedule_aggregates())
+
+def _shared_schedule_version(uid):
+    row = db.session.execute(_shared_schedule_version_stmt(), {'uid': uid}).one()
+    return hashlib.sha1(repr(tuple(row)).encode()).hexdigest()[:16]
 
 @app.route('/api/user/schedule', methods=['GET'])
 @user_login_required
 def api_user_schedule():
+    return jsonify(_user_schedule(current_user_id()))
+
+@lru_cache(maxsize=None)
+def _dashboard_version_stmt():
+    """Select of the dashboard aggregates; the `changed_*` columns are timestamps."""
+    def agg(model, expr, label=None):
+        return [
+            db.select(expr).where(visible).scalar_subquery().label(label and f'{label}_{n}')
+            for n, visible in enumerate(_visible_branches(model))
+        ]
+
+    schedule = _shared_schedule_aggregates()
+    own_state = GroupItemState.user_id == UID
+    return db.select(
+        *agg(CombatTask, func.count(CombatTask.id)),
+        *agg(CombatTask, func.max(CombatTask.id)),
+        *agg(CombatTask, func.max(CombatTask.created_at), 'changed_tasks'),
+        *agg(Assignment, func.count(Assignment.id)),
+        *agg(Assignment, func.max(Assignment.id)),
+        *agg(Assignment, func.max(Assignment.created_at), 'changed_assignments'),
+        *agg(Notification, func.count(Notification.id)),
+        *agg(Notification, func.max(Notification.id)),
+        *agg(Notification, func.max(Notification.created_at), 'changed_notifications'),
+        *agg(Notification, func.count(Notification.id).filter(Notification.is_read.is_(True))),
+        *agg(DaySchedule, func.count(DaySchedule.id)),
+        *agg(DaySchedule, func.max(DaySchedule.id)),
+        *schedule[:2],
+        schedule[2].label('changed_templates'),
+        schedule[3],
+        schedule[4].label('changed_overrides'),
+        db.select(func.count(GroupItemState.id)).where(own_state).scalar_subquery(),
+        db.select(func.max(GroupItemState.updated_at)).where(own_state).scalar_subquery().label('changed_states'),
+    )
+
+def _user_dashboard_version(uid):
+    """Return (etag, last_modified) for everything the user panel shows.
+
+    One round trip of scalar subqueries: row counts and max ids catch inserts
+    and deletes, the read count and the GroupItemState aggregates catch
+    notifications being marked read.
+    """
+    row = db.session.execute(_dashboard_version_stmt(), {'uid': uid}).one()
+    etag = hashlib.sha1(repr((uid,) + tuple(row)).encode()).hexdigest()
+    timestamps = [ts for key, ts in row._mapping.items() if key.startswith('changed_') and ts is not None]
+    if timestamps and isinstance(timestamps[0], str):
+        # SQLite returns max() over DATETIME columns as text
+        timestamps = [datetime.fromisoformat(ts) for ts in timestamps]
+    last_modified = max(timestamps).replace(microsecond=0) if timestamps else None
+    return etag, last_modified
+
+def _recent_rows(model, uid, groups):
+    return _user_page(model, uid, USER_LIST_PAGE_SIZE, groups)
+
+@app.route('/api/user/dashboard', methods=['GET'])
+@user_login_required
+def api_user_dashboard():
     uid = current_user_id()
-    items = DaySchedule.query.filter_by(user_id=uid).all()
-    return jsonify([
-        {
-            'id': s.id,
-            'day': s.day,
-            'wake_up': s.wake_up,
-            'training': s.training,
-            'duty': s.duty,
-            'rest': s.rest,
-            'lights_out': s.lights_out
-        } for s in items
-    ])
+    etag, last_modified = _user_dashboard_version(uid)
+
+    # Weak comparison: _compress_response hands out W/"..." for gzip/br bodies
+    not_modified = request.if_none_match.contains_weak(etag) if request.if_none_match else (
+        last_modified is not None
+        and request.if_modified_since is not None
+        and last_modified <= request.if_modified_since.replace(tzinfo=None)
+    )
+    if not_modified:
+        response = app.response_class(status=304)
+    else:
+        groups = _user_group_ids(uid)
+        response = jsonify({
+            'tasks': [_task_dict(t) for t, _ in _recent_rows(CombatTask, uid, groups)],
+            'assignments': [_assignment_dict(a) for a, _ in _recent_rows(Assignment, uid, groups)],
+            'notifications': [_with_state(_notification_dict(n), is_read)
+                              for n, is_read in _recent_rows(Notification, uid, groups)],
+            'schedule': _user_schedule(uid),
+            'schedule_version': _shared_schedule_version(uid)
+        })
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# -------- User live updates: in-process pub/sub + SSE --------
+class UserEvents:
+    """Wake-up signals for users whose panel data changed.
+
+    Subscribers only get notified; they read the actual rows back from the
+    database by cursor, so a missed signal (e.g. a job that ran in another
+    gunicorn worker) is picked up on the next heartbeat.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # user_id -> set of threading.Event
+
+    def subscribe(self, user_id):
+        event = threading.Event()
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, user_id, event):
+        with self._lock:
+            events = self._subscribers.get(user_id)
+            if events:
+                events.discard(event)
+                if not events:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_ids):
+        with self._lock:
+            for uid in user_ids:
+                for event in self._subscribers.get(uid, ()):
+                    event.set()
+
+user_events = UserEvents()
+
+SSE_MAX_STREAMS = int(os.getenv('SSE_MAX_STREAMS', '2'))  # per process; each holds a gunicorn thread
+SSE_HEARTBEAT = 15  # seconds between keepalives / database re-checks
+SSE_MAX_SECONDS = int(os.getenv('SSE_MAX_SECONDS', '300'))  # client reconnects with Last-Event-ID
+UPDATES_BATCH_SIZE = 200
+
+_sse_slots = threading.BoundedSemaphore(SSE_MAX_STREAMS)
+
+# Cursor over the four user collections: last seen ids as "tasks.assignments.notifications.schedule"
+_DELTA_SOURCES = (
+    ('tasks', CombatTask, _task_dict),
+    ('assignments', Assignment, _assignment_dict),
+    ('notifications', Notification, _notification_dict),
+    ('schedule', DaySchedule, _schedule_dict),
+)
+
+def _parse_updates_cursor(value):
+    ids = [int(part) for part in value.split('.')]
+    if len(ids) != len(_DELTA_SOURCES):
+        raise ValueError(value)
+    return ids
+
+def _format_updates_cursor(ids):
+    return '.'.join(str(i) for i in ids)
+
+def _current_updates_cursor(uid):
+    return [
+        max(db.session.query(func.coalesce(func.max(model.id), 0)).filter(visible).scalar()
+            for visible in _visible_branches(model, uid))
+        for _, model, _ in _DELTA_SOURCES
+    ]
+
+def _user_deltas(uid, cursor):
+    """Rows created after `cursor`, oldest first, and the advanced cursor."""
+    deltas = {}
+    next_cursor = []
+    groups = _user_group_ids(uid)
+    for (name, model, to_dict), last_id in zip(_DELTA_SOURCES, cursor):
+        rows = _user_page(model, uid, UPDATES_BATCH_SIZE, groups, since=last_id, ascending=True)
+        deltas[name] = [_with_state(to_dict(r), is_read) for r, is_read in rows]
+        next_cursor.append(rows[-1][0].id if rows else last_id)
+    return deltas, next_cursor
+
+@app.route('/api/user/updates', methods=['GET'])
+@user_login_required
+def api_user_updates():
+    """Polling fallback for clients that can't keep the SSE stream open."""
+    uid = current_user_id()
+    since = request.args.get('since')
+    try:
+        cursor = _parse_updates_cursor(since) if since else _current_updates_cursor(uid)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Некорректный курсор'}), 400
+    deltas, cursor = _user_deltas(uid, cursor)
+    deltas['cursor'] = _format_updates_cursor(cursor)
+    # Group schedules change in place rather than by new rows: clients
+    # reload the dashboard when this differs from the version they hold
+    deltas['schedule_version'] = _shared_schedule_version(uid)
+    return jsonify(deltas)
+
+@app.route('/api/user/stream', methods=['GET'])
+@user_login_required
+def api_user_stream():
+    uid = current_user_id()
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        cursor = _parse_updates_cursor(since) if since else _current_updates_cursor(uid)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Некорректный курсор'}), 400
+    schedule_version = request.args.get('schedule_version')
+    db.session.close()
+    if not _sse_slots.acquire(blocking=False):
+        return jsonify({'success': False, 'message': 'Слишком много подключений, используйте /api/user/updates'}), 503
+
+    def generate(cursor, schedule_version):
+        wakeup = user_events.subscribe(uid)
+        try:
+            yield 'retry: 5000\n\n'
+            deadline = time.monotonic() + SSE_MAX_SECONDS
+            while time.monotonic() < deadline:
+                deltas, cursor = _user_deltas(uid, cursor)
+                version = _shared_schedule_version(uid)
+                if schedule_version is not None and version != schedule_version:
+                    yield f'event: schedule\ndata: {json.dumps({"schedule_version": version})}\n\n'
+                schedule_version = version
+                # Don't hold a pooled connection while idle
+                db.session.close()
+                event_id = _format_updates_cursor(cursor)
+                if any(deltas.values()):
+                    yield f'id: {event_id}\nevent: delta\ndata: {json.dumps(deltas, ensure_ascii=False)}\n\n'
+                else:
+                    # Keepalive that still moves Last-Event-ID forward
+                    yield f'id: {event_id}\n\n'
+                wakeup.wait(SSE_HEARTBEAT)
+                wakeup.clear()
+        finally:
+            user_events.unsubscribe(uid, wakeup)
+
+    response = app.response_class(stream_with_context(generate(cursor, schedule_version)), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(_sse_slots.release)
+    return response
+
+def _submission_response(recruitment_id, username, password):
+    return jsonify({
+        'success': True, 
+        'message': 'Заявка успешно отправлена! Учетная запись создана.',
+        'id': recruitment_id,
+        'username': username,
+        'password': password,
+        'show_credentials': True
+    })
+
+def _submission_fingerprint(data):
+    payload = {k: v for k, v in data.items() if k != 'idempotency_key'}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode()).hexdigest()
+
+def _replay_submission(idempotency_key, fingerprint):
+    """Response of an earlier submission with the same key, or None.
+
+    The stored response carries the account's credentials, so it is only
+    replayed for the very same payload; a key reused with other data gets 409.
+    """
+    if not idempotency_key:
+        return None
+    recruitment = _recruitment_query().filter_by(idempotency_key=idempotency_key).first()
+    if recruitment is None or recruitment.user_account is None:
+        return None
+    if not secrets.compare_digest(recruitment.idempotency_fingerprint or '', fingerprint):
+        return jsonify({'success': False, 'message': 'Этот ключ уже использован для другой заявки'}), 409
+    user = recruitment.user_account
+    return _submission_response(recruitment.id, user.username, user.password)
+
 @app.route('/recruitment/submit', methods=['POST'])
 def submit_recruitment():
     try:
         # Accept both JSON and form submissions
         data = request.get_json(silent=True) or request.form.to_dict()
 
-        # Debug: log incoming payload
-        app.logger.info({'event': 'recruitment_submit_received', 'payload': data})
-
         # Basic required fields validation
         required_fields = [
             'last_name', 'first_name', 'birth_date', 'r_age', 'time_on_project',
@@ -308,6 +1094,20 @@ def submit_recruitment():
         if missing:
             return jsonify({'success': False, 'message': f"Отсутствуют обязательные поля: {', '.join(missing)}"}), 400
 
+        # Простейшая валидация логина/пароля (до любой записи в БД)
+        username = data.get('username', '').strip()
+        password = data.get('password', '').strip()
+        if len(username) < 3:
+            return jsonify({'success': False, 'message': 'Логин должен быть не короче 3 символов'}), 400
+        if len(password) < 6:
+            return jsonify({'success': False, 'message': 'Пароль должен быть не короче 6 символов'}), 400
+
+        idempotency_key = (request.headers.get('Idempotency-Key') or data.get('idempotency_key') or '').strip()[:64] or None
+        fingerprint = _submission_fingerprint(data)
+        replay = _replay_submission(idempotency_key, fingerprint)
+        if replay is not None:
+            return replay
+
         new_recruitment = Recruitment(
             last_name=data.get('last_name', ''),
             first_name=data.get('first_name', ''),
@@ -331,44 +1131,28 @@ def submit_recruitment():
             military_rank=data.get('military_rank', ''),
             previous_service=data.get('previous_service', ''),
             department_preference=data.get('department_preference', ''),
-            additional_info=data.get('additional_info', '')
+            additional_info=data.get('additional_info', ''),
+            idempotency_key=idempotency_key,
+            idempotency_fingerprint=fingerprint if idempotency_key else None
         )
-        
-        db.session.add(new_recruitment)
-        db.session.commit()
-        app.logger.info({'event': 'recruitment_saved', 'record': new_recruitment.to_dict()})
-        
-        # Создаем аккаунт пользователя с указанными логином и паролем
-        username = data.get('username', '').strip()
-        password = data.get('password', '').strip()
-
-        # Простейшая валидация логина/пароля
-        if len(username) < 3:
-            return jsonify({'success': False, 'message': 'Логин должен быть не короче 3 символов'}), 400
-        if len(password) < 6:
-            return jsonify({'success': False, 'message': 'Пароль должен быть не короче 6 символов'}), 400
-
-        # Проверка уникальности логина
-        if User.query.filter_by(username=username).first():
+        # Заявка и учетная запись сохраняются одной транзакцией
+        new_user = User(recruitment=new_recruitment, username=username, password=password)
+        db.session.add_all([new_recruitment, new_user])
+        try:
+            db.session.flush()
+            recruitment_id = new_recruitment.id
+            db.session.commit()
+        except IntegrityError:
+            # Unique constraints decide: a concurrent retry with the same key, or a taken login
+            db.session.rollback()
+            replay = _replay_submission(idempotency_key, fingerprint)
+            if replay is not None:
+                return replay
             return jsonify({'success': False, 'message': 'Логин уже занят, выберите другой'}), 400
+        invalidate_stats_cache()
+        app.logger.info({'event': 'recruitment_submitted', 'recruitment_id': recruitment_id, 'username': username})
 
-        new_user = User(
-            recruitment_id=new_recruitment.id,
-            username=username,
-            password=password
-        )
-        db.session.add(new_user)
-        db.session.commit()
-        app.logger.info({'event': 'user_created_for_recruitment', 'recruitment_id': new_recruitment.id, 'username': username})
-        
-        return jsonify({
-            'success': True, 
-            'message': 'Заявка успешно отправлена! Учетная запись создана.',
-            'id': new_recruitment.id,
-            'username': username,
-            'password': password,
-            'show_credentials': True
-        })
+        return _submission_response(recruitment_id, username, password)
     except Exception as e:
         db.session.rollback()
         app.logger.exception({'event': 'recruitment_submit_failed', 'error': str(e)})
@@ -413,14 +1197,256 @@ def admin_news():
 def admin_users():
     return render_template('admin_users.html')
 
+# -------- Applications list: keyset pagination --------
+APPLICATIONS_PAGE_SIZE = 50
+APPLICATIONS_MAX_PAGE_SIZE = 200
+
+def _encode_cursor(sort_value, row_id):
+    raw = f'{sort_value.isoformat()}|{row_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    raw = base64.urlsafe_b64decode(padded.encode()).decode()
+    sort_value, row_id = raw.rsplit('|', 1)
+    return datetime.fromisoformat(sort_value), int(row_id)
+
+def _parse_date_arg(name):
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    return datetime.strptime(value, '%Y-%m-%d')
+
+def _page_size_arg(default, maximum):
+    try:
+        limit = int(request.args.get('limit', default))
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+def _filter_applications(query):
+    """Apply the status/date_from/date_to request args; ValueError if malformed."""
+    status = request.args.get('status', '').strip()
+    date_from = _parse_date_arg('date_from')
+    date_to = _parse_date_arg('date_to')
+    if status:
+        query = query.filter(Recruitment.status == status)
+    if date_from:
+        query = query.filter(Recruitment.submission_date >= date_from)
+    if date_to:
+        query = query.filter(Recruitment.submission_date < date_to + timedelta(days=1))
+    return query
+
+def _application_list_item(r):
+    return {
+        'id': r.id,
+        'last_name': r.last_name,
+        'first_name': r.first_name,
+        'middle_name': r.middle_name,
+        'phone': r.phone,
+        'status': r.status,
+        'submission_date': r.submission_date.strftime('%Y-%m-%d %H:%M:%S'),
+        'username': r.username
+    }
+
 @app.route('/api/applications', methods=['GET'])
 def get_applications():
-    applications = Recruitment.query.order_by(Recruitment.submission_date.desc()).all()
-    return jsonify([app.to_dict() for app in applications])
+    limit = _page_size_arg(APPLICATIONS_PAGE_SIZE, APPLICATIONS_MAX_PAGE_SIZE)
+    descending = request.args.get('order', 'desc') != 'asc'
+    try:
+        cursor = request.args.get('cursor')
+        after = _decode_cursor(cursor) if cursor else None
+    except (ValueError, binascii.Error):
+        return jsonify({'success': False, 'message': 'Некорректные параметры запроса'}), 400
+
+    # Slim projection: only the columns shown in the admin table, no Text columns
+    query = db.session.query(
+        Recruitment.id,
+        Recruitment.last_name,
+        Recruitment.first_name,
+        Recruitment.middle_name,
+        Recruitment.phone,
+        Recruitment.status,
+        Recruitment.submission_date,
+        User.username,
+    ).outerjoin(User, User.recruitment_id == Recruitment.id)
+
+    try:
+        query = _filter_applications(query)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Некорректные параметры запроса'}), 400
+    if after:
+        key = db.tuple_(Recruitment.submission_date, Recruitment.id)
+        query = query.filter(key < after if descending else key > after)
+
+    if descending:
+        query = query.order_by(Recruitment.submission_date.desc(), Recruitment.id.desc())
+    else:
+        query = query.order_by(Recruitment.submission_date.asc(), Recruitment.id.asc())
+
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = _encode_cursor(rows[-1].submission_date, rows[-1].id) if has_more else None
+    return jsonify({
+        'items': [_application_list_item(r) for r in rows],
+        'next_cursor': next_cursor
+    })
+
+# -------- Applications full-text search --------
+# Index maintained by migrations 4 and 8: FTS5 table on SQLite, tsvector + GIN
+# on Postgres; phones are indexed as full, national and subscriber digits
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+# Digits of a national phone number; longer numbers carry a +7/8 prefix
+PHONE_NATIONAL_DIGITS = 10
+
+def _search_terms(q):
+    """Split user input into safe index terms; phone-like terms become bare
+    digits, and consecutive ones one term ("999 123-45" -> "99912345").
+
+    A full number is reduced to its national form, which migration 8 indexes
+    for every phone, so "8 999 123 45 67" finds "+7 (999) 123-45-67".
+    """
+    terms = []
+    after_digits = False
+    for word in q.split():
+        digits = any(ch.isdigit() for ch in word) and all(ch.isdigit() or ch in '+-().' for ch in word)
+        if digits:
+            word = ''.join(ch for ch in word if ch.isdigit())
+        else:
+            word = ''.join(ch for ch in word if ch.isalnum() or ch == '_')
+        if not word:
+            continue
+        if digits and after_digits:
+            terms[-1] += word
+        else:
+            terms.append(word.lower())
+        after_digits = digits
+    return [t[-PHONE_NATIONAL_DIGITS:] if t.isdigit() else t for t in terms]
+
+def _search_applications(terms, limit, offset):
+    """Ranked (best first) ids of applications matching all terms as prefixes."""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        sql = db.text(
+            'SELECT rowid AS id FROM recruitment_fts WHERE recruitment_fts MATCH :q '
+            # Weights follow the column order: names, nick and phone outrank free text
+            'ORDER BY bm25(recruitment_fts, 10.0, 10.0, 5.0, 10.0, 10.0, 1.0, 1.0) LIMIT :limit OFFSET :offset'
+        )
+        q = ' '.join(f'"{t}"*' for t in terms)
+    elif dialect == 'postgresql':
+        sql = db.text(
+            "SELECT id FROM recruitment, "
+            "(SELECT to_tsquery('simple', :q) || to_tsquery('russian', :q) AS query) AS tsq "
+            "WHERE search_vector @@ tsq.query "
+            "ORDER BY ts_rank(search_vector, tsq.query) DESC, id DESC LIMIT :limit OFFSET :offset"
+        )
+        q = ' & '.join(f'{t}:*' for t in terms)
+    else:
+        raise RuntimeError(f'Полнотекстовый поиск не поддерживается для {dialect}')
+    return [row.id for row in db.session.execute(sql, {'q': q, 'limit': limit, 'offset': offset})]
+
+@app.route('/api/admin/applications/search', methods=['GET'])
+@login_required
+def admin_search_applications():
+    terms = _search_terms(request.args.get('q', ''))
+    if not terms:
+        return jsonify({'success': False, 'message': 'Введите запрос для поиска'}), 400
+    limit = _page_size_arg(SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE)
+    page = max(1, request.args.get('page', 1, type=int))
+
+    ids = _search_applications(terms, limit + 1, (page - 1) * limit)
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+    rows = db.session.query(
+        Recruitment.id,
+        Recruitment.last_name,
+        Recruitment.first_name,
+        Recruitment.middle_name,
+        Recruitment.phone,
+        Recruitment.status,
+        Recruitment.submission_date,
+        User.username,
+    ).outerjoin(User, User.recruitment_id == Recruitment.id).filter(Recruitment.id.in_(ids)).all() if ids else []
+    by_id = {r.id: r for r in rows}
+    return jsonify({
+        'items': [_application_list_item(by_id[i]) for i in ids if i in by_id],
+        'page': page,
+        'has_more': has_more
+    })
+
+# -------- Applications export (streamed) --------
+EXPORT_BATCH_SIZE = 1000
+# Internal bookkeeping, not application data
+EXPORT_EXCLUDED = {'idempotency_key', 'idempotency_fingerprint'}
+EXPORT_COLUMNS = [
+    c.name for c in Recruitment.__table__.columns if c.name not in EXPORT_EXCLUDED
+] + ['username']
+
+def _export_rows():
+    """Yield export rows as dicts, fetched in batches over a server-side cursor."""
+    columns = [c for c in Recruitment.__table__.columns if c.name not in EXPORT_EXCLUDED]
+    query = db.session.query(*columns, User.username).outerjoin(User, User.recruitment_id == Recruitment.id)
+    query = _filter_applications(query).order_by(Recruitment.submission_date.asc(), Recruitment.id.asc())
+    for row in query.yield_per(EXPORT_BATCH_SIZE):
+        item = row._asdict()
+        if item['submission_date'] is not None:
+            item['submission_date'] = item['submission_date'].strftime('%Y-%m-%d %H:%M:%S')
+        yield item
+
+# Spreadsheet apps run cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+def _csv_cell(value):
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def _export_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    # BOM so spreadsheet apps detect UTF-8 (Cyrillic)
+    buffer.write('\ufeff')
+    writer.writeheader()
+    for n, row in enumerate(rows, 1):
+        writer.writerow({k: _csv_cell(v) for k, v in row.items()})
+        if n % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def _export_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+@app.route('/api/admin/applications/export', methods=['GET'])
+@login_required
+def admin_export_applications():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'success': False, 'message': 'Формат должен быть csv или ndjson'}), 400
+    try:
+        # Validate filters up front; the generator re-reads them lazily
+        _filter_applications(db.session.query(Recruitment.id))
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Некорректные параметры запроса'}), 400
+
+    body = _export_csv(_export_rows()) if fmt == 'csv' else _export_ndjson(_export_rows())
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    response = app.response_class(stream_with_context(body), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=applications.{fmt}'
+    return response
+
+def _recruitment_query():
+    # Eager-load the linked account so to_dict() never lazy-loads it per row
+    return Recruitment.query.options(joinedload(Recruitment.user_account))
 
 @app.route('/api/applications/<int:id>', methods=['GET'])
 def get_application(id):
-    application = Recruitment.query.get_or_404(id)
+    application = _recruitment_query().filter(Recruitment.id == id).first_or_404()
     return jsonify(application.to_dict())
 
 @app.route('/api/applications/<int:id>/status', methods=['PUT'])
@@ -429,12 +1455,55 @@ def update_application_status(id):
     data = request.get_json()
     application.status = data.get('status', application.status)
     db.session.commit()
+    invalidate_stats_cache()
     return jsonify({'success': True, 'message': 'Статус обновлен'})
 
+# -------- Public news: shared response cache --------
+def _make_news_cache():
+    ttl = app.config['NEWS_CACHE_TTL']
+    if app.config['NEWS_CACHE_BACKEND'] == 'filesystem':
+        directory = app.config['NEWS_CACHE_DIR'] or os.path.join(app.instance_path, 'news_cache')
+        backend = cache_backends.FileSystemCache(directory, ttl=ttl)
+    else:
+        backend = cache_backends.LRUCache(maxsize=256, ttl=ttl)
+    return cache_backends.ResponseCache(backend)
+
+def invalidate_news_cache():
+    app.extensions['news_cache'].invalidate()
+
+def _wants_fresh_news():
+    # The admin news page asks for fresh=1 so an edit made through another
+    # worker shows up at once; the session is only read then, so public
+    # responses don't vary on the cookie
+    return request.args.get('fresh') == '1' and session.get('admin_logged_in')
+
+def _cached_json(key, build):
+    """Serve build() as JSON from the news cache, with a strong ETag and 304s."""
+    if _wants_fresh_news():
+        response = jsonify(build())
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+    cache = app.extensions['news_cache']
+    # Read the generation before building: if an edit lands meanwhile, this
+    # entry is stored under the old generation and never served
+    generation = cache.generation()
+    entry = cache.get(generation, key)
+    if entry is None:
+        body = jsonify(build()).get_data()
+        entry = (body, hashlib.sha1(body).hexdigest())
+        cache.set(generation, key, entry)
+    body, etag = entry
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f"public, max-age={app.config['NEWS_MAX_AGE']}, must-revalidate"
+    return response.make_conditional(request)
+
 @app.route('/api/news', methods=['GET'])
 def get_news():
-    news = News.query.order_by(News.date.desc()).limit(10).all()
-    return jsonify([item.to_dict() for item in news])
+    def build():
+        news = News.query.order_by(News.date.desc()).limit(10).all()
+        return [item.to_dict() for item in news]
+    return _cached_json('news:latest', build)
 
 @app.route('/api/news', methods=['POST'])
 @login_required
@@ -448,12 +1517,72 @@ def create_news():
     )
     db.session.add(news_item)
     db.session.commit()
+    invalidate_stats_cache()
+    invalidate_news_cache()
     return jsonify({'success': True, 'message': 'Новость создана', 'id': news_item.id})
 
+# Archive list: keyset pages on (date, id), no `content` beyond an excerpt
+NEWS_PAGE_SIZE = 20
+NEWS_MAX_PAGE_SIZE = 100
+NEWS_EXCERPT_LENGTH = 200
+# First archive pages are cached only for the site's categories and page
+# sizes: keys built from arbitrary query strings would grow the cache without
+# bound (the filesystem backend has no size limit)
+NEWS_CATEGORIES = ('Новости', 'Учения', 'События', 'Техника')
+NEWS_CACHED_PAGE_SIZES = (10, NEWS_PAGE_SIZE)
+
+def _news_list_item(n):
+    excerpt = n.excerpt or ''
+    if n.content_length > NEWS_EXCERPT_LENGTH:
+        excerpt = excerpt.rstrip() + '…'
+    return {
+        'id': n.id,
+        'title': n.title,
+        'excerpt': excerpt,
+        'date': n.date.strftime('%Y-%m-%d'),
+        'category': n.category,
+        'author': n.author
+    }
+
+def _news_archive_page(limit, after, category):
+    query = db.session.query(
+        News.id,
+        News.title,
+        func.substr(News.content, 1, NEWS_EXCERPT_LENGTH).label('excerpt'),
+        func.length(News.content).label('content_length'),
+        News.date,
+        News.category,
+        News.author,
+    )
+    if category:
+        query = query.filter(News.category == category)
+    if after:
+        query = query.filter(db.tuple_(News.date, News.id) < after)
+    rows = query.order_by(News.date.desc(), News.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'items': [_news_list_item(n) for n in rows],
+        'next_cursor': _encode_cursor(rows[-1].date, rows[-1].id) if has_more else None
+    }
+
+@app.route('/api/news/archive', methods=['GET'])
+def get_news_archive():
+    limit = _page_size_arg(NEWS_PAGE_SIZE, NEWS_MAX_PAGE_SIZE)
+    category = request.args.get('category', '').strip()
+    try:
+        cursor = request.args.get('cursor')
+        after = _decode_cursor(cursor) if cursor else None
+    except (ValueError, binascii.Error):
+        return jsonify({'success': False, 'message': 'Некорректные параметры запроса'}), 400
+    if after or limit not in NEWS_CACHED_PAGE_SIZES or (category and category not in NEWS_CATEGORIES):
+        # Deep pages are rarely re-read; only known first pages go through the cache
+        return jsonify(_news_archive_page(limit, after, category))
+    return _cached_json(f'news:archive:{category}:{limit}', lambda: _news_archive_page(limit, None, category))
+
 @app.route('/api/news/<int:id>', methods=['GET'])
 def get_news_item(id):
-    news_item = News.query.get_or_404(id)
-    return jsonify(news_item.to_dict())
+    return _cached_json(f'news:{id}', lambda: News.query.get_or_404(id).to_dict())
 
 @app.route('/api/news/<int:id>', methods=['PUT'])
 @login_required
@@ -467,6 +1596,8 @@ def update_news(id):
     news_item.author = data.get('author', news_item.author)
     
     db.session.commit()
+    invalidate_stats_cache()
+    invalidate_news_cache()
     return jsonify({'success': True, 'message': 'Новость обновлена'})
 
 @app.route('/api/news/<int:id>', methods=['DELETE'])
@@ -475,8 +1606,62 @@ def delete_news(id):
     news_item = News.query.get_or_404(id)
     db.session.delete(news_item)
     db.session.commit()
+    invalidate_stats_cache()
+    invalidate_news_cache()
     return jsonify({'success': True, 'message': 'Новость удалена'})
 
+# -------- Admin APIs: Dashboard stats --------
+STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', '30'))  # seconds
+STATS_DAYS = 30
+
+_stats_cache = {'value': None, 'expires_at': 0.0, 'generation': 0}
+_stats_lock = threading.Lock()
+
+def invalidate_stats_cache():
+    with _stats_lock:
+        _stats_cache['value'] = None
+        _stats_cache['generation'] += 1
+
+def _compute_stats():
+    by_status = {
+        (status or ''): n for status, n in
+        db.session.query(Recruitment.status, func.count(Recruitment.id))
+        .group_by(Recruitment.status)
+        .all()
+    }
+    since = datetime.utcnow() - timedelta(days=STATS_DAYS)
+    day = func.date(Recruitment.submission_date)
+    by_day = (
+        db.session.query(day, func.count(Recruitment.id))
+        .filter(Recruitment.submission_date >= since)
+        .group_by(day)
+        .order_by(day)
+        .all()
+    )
+    return {
+        'total_applications': sum(by_status.values()),
+        'by_status': by_status,
+        'by_day': [{'date': str(d), 'count': n} for d, n in by_day],
+        'total_news': db.session.query(func.count(News.id)).scalar()
+    }
+
+@app.route('/api/admin/stats', methods=['GET'])
+@login_required
+def admin_stats():
+    now = time.monotonic()
+    with _stats_lock:
+        if _stats_cache['value'] is not None and _stats_cache['expires_at'] > now:
+            return jsonify(_stats_cache['value'])
+        # Read the generation before computing: if a change invalidates the
+        # cache meanwhile, this result may miss it and is not stored
+        generation = _stats_cache['generation']
+    stats = _compute_stats()
+    with _stats_lock:
+        if _stats_cache['generation'] == generation:
+            _stats_cache['value'] = stats
+            _stats_cache['expires_at'] = now + STATS_CACHE_TTL
+    return jsonify(stats)
+
 # -------- Admin APIs: Groups management --------
 @app.route('/api/admin/users', methods=['GET'])
 @login_required
@@ -526,9 +1711,15 @@ def admin_update_group(group_id):
 @login_required
 def admin_delete_group(group_id):
     g = Group.query.get_or_404(group_id)
+    members = _resolve_targets(None, group_id)
+    _forget_group_state(group_id, db.select(GroupMember.user_id).filter_by(group_id=group_id))
+    for model in GROUP_ITEM_TYPES:
+        model.query.filter_by(group_id=group_id).delete(synchronize_session=False)
+    ScheduleTemplate.query.filter_by(group_id=group_id).delete()
     GroupMember.query.filter_by(group_id=group_id).delete()
     db.session.delete(g)
     db.session.commit()
+    user_events.publish(members)
     return jsonify({'success': True})
 
 @app.route('/api/admin/users/<int:user_id>', methods=['PUT'])
@@ -541,12 +1732,33 @@ def admin_update_user(user_id):
     db.session.commit()
     return jsonify({'success': True})
 
+GROUP_MEMBERS_PAGE_SIZE = 100
+GROUP_MEMBERS_MAX_PAGE_SIZE = 500
+GROUP_BULK_MAX = 5000  # usernames/ids per bulk membership request
+
 @app.route('/api/admin/groups/<int:group_id>/members', methods=['GET'])
 @login_required
 def admin_list_group_members(group_id):
+    """Members with their usernames in one joined query, paged by user id
+    (the order of the (group_id, user_id) index): `limit`, `cursor`."""
     Group.query.get_or_404(group_id)
-    members = GroupMember.query.filter_by(group_id=group_id).all()
-    return jsonify([{ 'id': m.id, 'user_id': m.user_id, 'username': User.query.get(m.user_id).username } for m in members])
+    limit = _page_size_arg(GROUP_MEMBERS_PAGE_SIZE, GROUP_MEMBERS_MAX_PAGE_SIZE)
+    try:
+        after = int(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Некорректные параметры запроса'}), 400
+    query = (db.session.query(GroupMember.id, GroupMember.user_id, User.username)
+             .join(User, User.id == GroupMember.user_id)
+             .filter(GroupMember.group_id == group_id))
+    if after is not None:
+        query = query.filter(GroupMember.user_id > after)
+    rows = query.order_by(GroupMember.user_id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return jsonify({
+        'items': [{'id': m.id, 'user_id': m.user_id, 'username': m.username} for m in rows],
+        'next_cursor': str(rows[-1].user_id) if has_more else None
+    })
 
 @app.route('/api/admin/groups/<int:group_id>/members', methods=['POST'])
 @login_required
@@ -562,152 +1774,551 @@ def admin_add_group_member(group_id):
         return jsonify({'success': False, 'message': 'Уже в группе'}), 400
     gm = GroupMember(group_id=group_id, user_id=user.id)
     db.session.add(gm)
+    _adjust_group_unread(group_id, [user.id], 1)
     db.session.commit()
+    user_events.publish([user.id])
     return jsonify({'success': True})
 
+def _forget_group_state(group_id, user_ids):
+    """Drop what `user_ids` (a list or a select of ids) kept for the group's
+    shared items (schedule overrides, read flags) and take its unread
+    notifications off their counters; for members leaving the group."""
+    _adjust_group_unread(group_id, user_ids, -1)
+    templates = db.select(ScheduleTemplate.id).filter_by(group_id=group_id)
+    ScheduleOverride.query.filter(
+        ScheduleOverride.user_id.in_(user_ids), ScheduleOverride.template_id.in_(templates)
+    ).delete(synchronize_session=False)
+    for model, item_type in GROUP_ITEM_TYPES.items():
+        items = db.select(model.id).filter_by(group_id=group_id)
+        GroupItemState.query.filter(
+            GroupItemState.user_id.in_(user_ids), GroupItemState.item_type == item_type, GroupItemState.item_id.in_(items)
+        ).delete(synchronize_session=False)
+
 @app.route('/api/admin/groups/<int:group_id>/members/<int:user_id>', methods=['DELETE'])
 @login_required
 def admin_remove_group_member(group_id, user_id):
     gm = GroupMember.query.filter_by(group_id=group_id, user_id=user_id).first_or_404()
+    _forget_group_state(group_id, [user_id])
     db.session.delete(gm)
     db.session.commit()
+    user_events.publish([user_id])
     return jsonify({'success': True})
 
+def _resolve_users(keys):
+    """Map usernames (str) and user ids (int) to users in one IN query.
+
+    Returns ({user_id: username}, keys that matched no user).
+    """
+    ids = {k for k in keys if isinstance(k, int)}
+    names = keys - ids
+    found = dict(db.session.query(User.id, User.username).filter(
+        db.or_(User.id.in_(ids), User.username.in_(names))
+    ).all()) if keys else {}
+    missing = keys - set(found) - set(found.values())
+    return found, sorted(missing, key=str)
+
+def _bulk_entries(data, key):
+    """The set of usernames/ids under `key`; ValueError if malformed."""
+    entries = data.get(key) or []
+    if not isinstance(entries, list):
+        raise ValueError(key)
+    keys = set()
+    for e in entries:
+        if isinstance(e, str) and e.strip():
+            keys.add(e.strip())
+        elif isinstance(e, int) and not isinstance(e, bool):
+            keys.add(e)
+        else:
+            raise ValueError(key)
+    return keys
+
+@app.route('/api/admin/groups/<int:group_id>/members/bulk', methods=['POST'])
+@login_required
+def admin_bulk_group_members(group_id):
+    """Add and/or remove many members at once.
+
+    Body: {"add": [...], "remove": [...]}, each a list of usernames (strings)
+    or user ids (integers). Whatever the batch size: one IN query resolves
+    the users, one query finds who is already a member, one statement
+    inserts the rest and one deletes the removed memberships.
+    """
+    Group.query.get_or_404(group_id)
+    data = request.get_json() or {}
+    try:
+        to_add = _bulk_entries(data, 'add')
+        to_remove = _bulk_entries(data, 'remove')
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Некорректные параметры запроса'}), 400
+    if len(to_add) + len(to_remove) > GROUP_BULK_MAX:
+        return jsonify({'success': False, 'message': f'Не более {GROUP_BULK_MAX} пользователей за запрос'}), 400
+
+    users, not_found = _resolve_users(to_add | to_remove)
+    wanted = {uid for uid, name in users.items() if uid in to_add or name in to_add}
+    unwanted = {uid for uid, name in users.items() if uid in to_remove or name in to_remove} - wanted
+    current = set(db.session.scalars(
+        db.select(GroupMember.user_id).where(GroupMember.group_id == group_id, GroupMember.user_id.in_(wanted | unwanted))
+    )) if wanted or unwanted else set()
+    added = sorted(wanted - current)
+    removed = sorted(unwanted & current)
+
+    if added:
+        now = datetime.utcnow()
+        db.session.execute(GroupMember.__table__.insert(), [
+            {'group_id': group_id, 'user_id': uid, 'added_at': now} for uid in added
+        ])
+        _adjust_group_unread(group_id, added, 1)
+    if removed:
+        _forget_group_state(group_id, removed)
+        db.session.execute(
+            db.delete(GroupMember)
+            .where(GroupMember.group_id == group_id, GroupMember.user_id.in_(removed))
+            .execution_options(synchronize_session=False)
+        )
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request added some of the same users meanwhile
+        db.session.rollback()
+        return jsonify({'success': False, 'message': 'Состав группы изменился, повторите запрос'}), 409
+    user_events.publish(added + removed)
+    return jsonify({
+        'success': True,
+        'added': [users[uid] for uid in added],
+        'removed': [users[uid] for uid in removed],
+        'unchanged': [users[uid] for uid in sorted((wanted & current) | (unwanted - current))],
+        'not_found': not_found
+    })
+
 # -------- Admin APIs: Actions (tasks, assignments, schedule) --------
+FANOUT_CHUNK_SIZE = 1000
+
 def _resolve_targets(user_id, group_id):
-    targets = []
+    # Only user ids are needed: select the column, don't hydrate GroupMember objects
     if user_id:
-        user = User.query.get(user_id)
-        if not user:
-            return []
-        targets = [user.id]
-    elif group_id:
-        user_ids = [m.user_id for m in GroupMember.query.filter_by(group_id=group_id).all()]
-        targets = user_ids
-    return targets
+        uid = db.session.query(User.id).filter_by(id=user_id).scalar()
+        return [uid] if uid else []
+    if group_id:
+        return db.session.scalars(
+            db.select(GroupMember.user_id).filter_by(group_id=group_id)
+        ).all()
+    return []
+
+def _bulk_fan_out(model, targets, values, on_chunk=None):
+    """Insert one `model` row per target user via chunked executemany.
+
+    Bypasses the ORM unit of work, so large groups don't materialize
+    thousands of objects in the session. `on_chunk(rows_so_far)` is called
+    after each chunk. Returns the number of rows created.
+    """
+    table = model.__table__
+    for start in range(0, len(targets), FANOUT_CHUNK_SIZE):
+        chunk = targets[start:start + FANOUT_CHUNK_SIZE]
+        db.session.execute(table.insert(), [dict(values, user_id=uid) for uid in chunk])
+        if model is Notification:
+            # Same transaction as the rows, so the counter can't drift
+            _adjust_unread(chunk, 1)
+        if on_chunk:
+            on_chunk(start + len(chunk))
+    return len(targets)
+
+def _task_values(data):
+    return {
+        'title': data.get('title', '').strip(),
+        'description': data.get('description', ''),
+        'status': data.get('status', 'new'),
+        'priority': data.get('priority', 'normal'),
+        'due_date': data.get('due_date')
+    }
+
+def _assignment_values(data):
+    return {
+        'title': data.get('title', '').strip(),
+        'description': data.get('description', ''),
+        'issued_by': data.get('issued_by', 'Командование'),
+        'status': data.get('status', 'assigned')
+    }
+
+def _schedule_values(data):
+    return {
+        'day': data.get('day', '').strip(),
+        'wake_up': data.get('wake_up'),
+        'training': data.get('training'),
+        'duty': data.get('duty'),
+        'rest': data.get('rest'),
+        'lights_out': data.get('lights_out')
+    }
+
+def _notification_values(data):
+    return {
+        'content': data.get('content', '').strip(),
+        'is_read': False
+    }
+
+FAN_OUT_ACTIONS = {
+    'task': (CombatTask, _task_values),
+    'assignment': (Assignment, _assignment_values),
+    'schedule': (DaySchedule, _schedule_values),
+    'notification': (Notification, _notification_values),
+}
+
+# -------- Background job queue --------
+# Jobs are rows in the `job` table; each process runs a small pool of worker
+# threads that claim queued rows atomically, so no external broker is needed
+# and any gunicorn worker can report progress for any job.
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1.0'))  # seconds
+# A job still `running` this long after it was claimed lost its worker
+# (killed process, deploy restart); idle workers check once a minute
+JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT', '900'))  # seconds
+JOB_RECOVERY_INTERVAL = 60  # seconds
+
+_job_wakeup = threading.Event()
+_job_threads = []
+_job_threads_pid = None
+_job_threads_lock = threading.Lock()
+
+def enqueue_job(kind, payload):
+    job = Job(kind=kind, payload=json.dumps(payload, ensure_ascii=False))
+    db.session.add(job)
+    db.session.commit()
+    _ensure_job_workers()
+    _job_wakeup.set()
+    return job
+
+@app.before_request
+def _start_job_workers():
+    # Entry points that skip create_app() (`gunicorn app:app`, `flask run`)
+    if _job_threads_pid != os.getpid():
+        _ensure_job_workers()
+
+def _ensure_job_workers():
+    global _job_threads_pid
+    with _job_threads_lock:
+        # Threads don't survive fork (gunicorn --preload): start again in the child
+        if _job_threads and _job_threads_pid == os.getpid():
+            return
+        _job_threads.clear()
+        _job_threads_pid = os.getpid()
+        for i in range(JOB_WORKERS):
+            t = threading.Thread(target=_job_worker_loop, name=f'job-worker-{i}', daemon=True)
+            t.start()
+            _job_threads.append(t)
+
+def _claim_next_job():
+    job_id = db.session.scalar(
+        db.select(Job.id).filter_by(status='queued').order_by(Job.id).limit(1)
+    )
+    if job_id is None:
+        return None
+    claimed = db.session.execute(
+        db.update(Job)
+        .where(Job.id == job_id, Job.status == 'queued')
+        .values(status='running', started_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    return job_id if claimed else None
+
+def _recover_stale_jobs():
+    """Release jobs left `running` past JOB_TIMEOUT by a worker that died.
+
+    A job that committed no chunk goes back to the queue; a partly fanned-out
+    one is failed, since running it again would create its committed rows
+    twice. Returns the number of jobs released.
+    """
+    stale = (Job.status == 'running') & (Job.started_at < datetime.utcnow() - timedelta(seconds=JOB_TIMEOUT))
+    # Check first: an UPDATE takes the write lock even when nothing matches
+    if db.session.scalar(db.select(Job.id).where(stale).limit(1)) is None:
+        return 0
+    requeued = db.session.execute(
+        db.update(Job).where(stale, func.coalesce(Job.done, 0) == 0)
+        .values(status='queued', started_at=None)
+    ).rowcount
+    failed = db.session.execute(
+        db.update(Job).where(stale, Job.done > 0)
+        .values(status='failed', error='Обработчик задания остановился до его завершения',
+                finished_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    if requeued or failed:
+        app.logger.warning({'event': 'jobs_recovered', 'requeued': requeued, 'failed': failed})
+    if requeued:
+        _job_wakeup.set()
+    return requeued + failed
+
+def _run_fan_out_job(job):
+    model, build_values = FAN_OUT_ACTIONS[job.kind]
+    data = json.loads(job.payload)
+    targets = _resolve_targets(data.get('user_id'), data.get('group_id'))
+    job.total = len(targets)
+    db.session.commit()
+
+    def progress(rows):
+        # Each chunk commits together with its progress update
+        notify = targets[job.done:rows]
+        job.done = rows
+        db.session.commit()
+        user_events.publish(notify)
+
+    _bulk_fan_out(model, targets, build_values(data), on_chunk=progress)
+
+def _job_worker_loop():
+    next_recovery = 0
+    while True:
+        _job_wakeup.wait(JOB_POLL_INTERVAL)
+        with app.app_context():
+            try:
+                job_id = _claim_next_job()
+                if job_id is None and time.monotonic() >= next_recovery:
+                    next_recovery = time.monotonic() + JOB_RECOVERY_INTERVAL
+                    _recover_stale_jobs()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f'[Jobs] Ошибка выборки задания: {e}')
+                continue
+            if job_id is None:
+                _job_wakeup.clear()
+                continue
+            job = db.session.get(Job, job_id)
+            try:
+                _run_fan_out_job(job)
+                job.status = 'done'
+            except Exception as e:
+                db.session.rollback()
+                app.logger.exception({'event': 'job_failed', 'job_id': job_id, 'error': str(e)})
+                job.status = 'failed'
+                job.error = str(e)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+
+def _enqueue_fan_out(kind, data):
+    if app.config['GROUP_ITEMS'] == 'shared' and data.get('group_id') and not data.get('user_id'):
+        return _store_group_item(kind, data)
+    job = enqueue_job(kind, data)
+    return jsonify({'success': True, 'job_id': job.id}), 202
+
+def _store_group_item(kind, data):
+    """Store a group-addressed item once; members see it through GroupMember,
+    including those who join later."""
+    model, build_values = FAN_OUT_ACTIONS[kind]
+    group_id = data['group_id']
+    Group.query.get_or_404(group_id)
+    item = model(group_id=group_id, **build_values(data))
+    db.session.add(item)
+    if model is Notification:
+        db.session.execute(
+            db.update(User)
+            .where(User.id.in_(db.select(GroupMember.user_id).filter_by(group_id=group_id)))
+            .values(unread_notifications=User.unread_notifications + 1)
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+    _publish_group(group_id)
+    return jsonify({'success': True, 'item_id': item.id}), 201
 
 @app.route('/api/admin/actions/task', methods=['POST'])
 @login_required
 def admin_create_task():
     data = request.get_json() or {}
-    user_id = data.get('user_id')
-    group_id = data.get('group_id')
-    title = data.get('title', '').strip()
-    if not title:
+    if not data.get('title', '').strip():
         return jsonify({'success': False, 'message': 'Заголовок обязателен'}), 400
-    targets = _resolve_targets(user_id, group_id)
-    for uid in targets:
-        t = CombatTask(
-            user_id=uid,
-            title=title,
-            description=data.get('description', ''),
-            status=data.get('status', 'new'),
-            priority=data.get('priority', 'normal'),
-            due_date=data.get('due_date')
-        )
-        db.session.add(t)
-    db.session.commit()
-    return jsonify({'success': True, 'created_for': len(targets)})
+    return _enqueue_fan_out('task', data)
 
 @app.route('/api/admin/actions/assignment', methods=['POST'])
 @login_required
 def admin_create_assignment():
     data = request.get_json() or {}
-    user_id = data.get('user_id')
-    group_id = data.get('group_id')
-    title = data.get('title', '').strip()
-    if not title:
+    if not data.get('title', '').strip():
         return jsonify({'success': False, 'message': 'Заголовок обязателен'}), 400
-    targets = _resolve_targets(user_id, group_id)
-    for uid in targets:
-        a = Assignment(
-            user_id=uid,
-            title=title,
-            description=data.get('description', ''),
-            issued_by=data.get('issued_by', 'Командование'),
-            status=data.get('status', 'assigned'),
-        )
-        db.session.add(a)
-    db.session.commit()
-    return jsonify({'success': True, 'created_for': len(targets)})
+    return _enqueue_fan_out('assignment', data)
 
 @app.route('/api/admin/actions/schedule', methods=['POST'])
 @login_required
 def admin_create_schedule():
     data = request.get_json() or {}
-    user_id = data.get('user_id')
-    group_id = data.get('group_id')
-    day = data.get('day', '').strip()
-    if not day:
+    if not data.get('day', '').strip():
         return jsonify({'success': False, 'message': 'День обязателен'}), 400
-    targets = _resolve_targets(user_id, group_id)
-    for uid in targets:
-        s = DaySchedule(
-            user_id=uid,
-            day=day,
-            wake_up=data.get('wake_up'),
-            training=data.get('training'),
-            duty=data.get('duty'),
-            rest=data.get('rest'),
-            lights_out=data.get('lights_out')
-        )
-        db.session.add(s)
+    if data.get('group_id') and not data.get('user_id'):
+        # Stored once for the group and resolved per member on read, so no
+        # job and no per-member rows
+        Group.query.get_or_404(data['group_id'])
+        template = ScheduleTemplate(group_id=data['group_id'], **_schedule_values(data))
+        db.session.add(template)
+        db.session.commit()
+        _publish_group(template.group_id)
+        return jsonify({'success': True, 'template_id': template.id}), 201
+    return _enqueue_fan_out('schedule', data)
+
+def _publish_group(group_id):
+    user_events.publish(_resolve_targets(None, group_id))
+
+def _template_dict(t):
+    return {'id': t.id, 'group_id': t.group_id, 'day': t.day, **{f: getattr(t, f) for f in SCHEDULE_FIELDS}}
+
+@app.route('/api/admin/groups/<int:group_id>/schedule', methods=['GET'])
+@login_required
+def admin_list_schedule_templates(group_id):
+    Group.query.get_or_404(group_id)
+    templates = ScheduleTemplate.query.filter_by(group_id=group_id).order_by(ScheduleTemplate.id).all()
+    return jsonify([_template_dict(t) for t in templates])
+
+@app.route('/api/admin/schedule-templates/<int:template_id>', methods=['PUT'])
+@login_required
+def admin_update_schedule_template(template_id):
+    template = ScheduleTemplate.query.get_or_404(template_id)
+    data = request.get_json() or {}
+    if 'day' in data:
+        day = (data.get('day') or '').strip()
+        if not day:
+            return jsonify({'success': False, 'message': 'День обязателен'}), 400
+        template.day = day
+    for field in SCHEDULE_FIELDS:
+        if field in data:
+            setattr(template, field, data.get(field))
     db.session.commit()
-    return jsonify({'success': True, 'created_for': len(targets)})
+    _publish_group(template.group_id)
+    return jsonify({'success': True})
 
-# Initialize database automatically if empty (table or DB does not exist)
-def auto_db_init():
-    try:
-        inspector = db.inspect(db.engine)
-        tables = inspector.get_table_names()
-        if not tables:
-            db.create_all()
-            app.logger.info('[Auto-DB-Init] Все таблицы созданы (база была пуста)')
-        else:
-            app.logger.info('[Auto-DB-Init] Таблицы уже существуют, инициализация не требуется')
-    except Exception as e:
-        app.logger.error(f'[Auto-DB-Init] Ошибка инициализации БД: {e}')
+@app.route('/api/admin/schedule-templates/<int:template_id>', methods=['DELETE'])
+@login_required
+def admin_delete_schedule_template(template_id):
+    template = ScheduleTemplate.query.get_or_404(template_id)
+    group_id = template.group_id
+    ScheduleOverride.query.filter_by(template_id=template_id).delete()
+    db.session.delete(template)
+    db.session.commit()
+    _publish_group(group_id)
+    return jsonify({'success': True})
 
-with app.app_context():
-    auto_db_init()
-    # SQLite-only compatibility ALTERs (skip on Postgres)
-    try:
-        if db.engine.url.drivername.startswith('sqlite'):
-            existing_cols = {row[1] for row in db.session.execute(db.text('PRAGMA table_info(recruitment)'))}
-            recruitment_columns = {
-                'r_age': 'VARCHAR(10)',
-                'time_on_project': 'VARCHAR(100)',
-                'previous_faction_experience': 'VARCHAR(200)',
-                'shooting_skills': 'VARCHAR(10)',
-                'knowledge_of_law': 'TEXT',
-                'passport_series': 'VARCHAR(10)',
-                'passport_number': 'VARCHAR(20)',
-                'email': 'VARCHAR(100)',
-                'roblox_nick': 'VARCHAR(100)',
-                'address': 'TEXT',
-                'education': 'VARCHAR(200)',
-                'work_experience': 'TEXT',
-                'live_in_area': 'VARCHAR(200)',
-                'ready_to_serve_the_country': 'VARCHAR(100)',
-                'military_rank': 'VARCHAR(50)',
-                'previous_service': 'TEXT',
-                'department_preference': 'VARCHAR(200)',
-                'additional_info': 'TEXT'
-            }
-            for col_name, col_type in recruitment_columns.items():
-                if col_name not in existing_cols:
-                    db.session.execute(db.text(f'ALTER TABLE recruitment ADD COLUMN {col_name} {col_type}'))
-
-            user_cols = {row[1] for row in db.session.execute(db.text('PRAGMA table_info(user)'))}
-            if 'rank' not in user_cols:
-                db.session.execute(db.text('ALTER TABLE user ADD COLUMN rank VARCHAR(50)'))
-            db.session.commit()
-    except Exception:
-        db.session.rollback()
-    
-    # No default news seeding
+@app.route('/api/admin/schedule-templates/<int:template_id>/overrides/<int:user_id>', methods=['PUT'])
+@login_required
+def admin_set_schedule_override(template_id, user_id):
+    template = ScheduleTemplate.query.get_or_404(template_id)
+    if not GroupMember.query.filter_by(group_id=template.group_id, user_id=user_id).first():
+        return jsonify({'success': False, 'message': 'Пользователь не состоит в группе'}), 400
+    data = request.get_json() or {}
+    override = ScheduleOverride.query.filter_by(template_id=template_id, user_id=user_id).first()
+    if override is None:
+        override = ScheduleOverride(template_id=template_id, user_id=user_id)
+        db.session.add(override)
+    for field in SCHEDULE_FIELDS:
+        if field in data:
+            setattr(override, field, data.get(field))
+    # Touch the row even when no field changed, so the user's version moves
+    override.updated_at = datetime.utcnow()
+    db.session.commit()
+    user_events.publish([user_id])
+    return jsonify({'success': True})
+
+@app.route('/api/admin/schedule-templates/<int:template_id>/overrides/<int:user_id>', methods=['DELETE'])
+@login_required
+def admin_delete_schedule_override(template_id, user_id):
+    override = ScheduleOverride.query.filter_by(template_id=template_id, user_id=user_id).first_or_404()
+    db.session.delete(override)
+    db.session.commit()
+    user_events.publish([user_id])
+    return jsonify({'success': True})
+
+@app.route('/api/admin/actions/notification', methods=['POST'])
+@login_required
+def admin_create_notification():
+    data = request.get_json() or {}
+    if not data.get('content', '').strip():
+        return jsonify({'success': False, 'message': 'Текст уведомления обязателен'}), 400
+    return _enqueue_fan_out('notification', data)
+
+@app.route('/api/admin/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def admin_get_job(job_id):
+    job = Job.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+# -------- App factory, DB and asset commands --------
+# Read once when the extensions are bound at import; set them through the
+# environment. Everything else is read per request.
+_BIND_TIME_CONFIG = (
+    'SQLALCHEMY_DATABASE_URI', 'SQLALCHEMY_ENGINE_OPTIONS', 'SQLALCHEMY_BINDS',
+    'NEWS_CACHE_BACKEND', 'NEWS_CACHE_DIR', 'NEWS_CACHE_TTL', 'JSON_PROVIDER',
+    'METRICS_ENABLED', 'METRICS_DIR', 'METRICS_TOKEN', 'METRICS_PUBLIC', 'SLOW_QUERY_MS',
+)
+
+def create_app(config=None):
+    """Apply `config`, start the job workers and return the app; safe to
+    call more than once.
+
+    The extensions are already bound at import, so `app:app` serves as well;
+    changing a _BIND_TIME_CONFIG key here raises RuntimeError. Does not
+    connect to the database: schema changes are applied separately with
+    `flask --app app db upgrade`.
+    """
+    _init_extensions(config)
+    _ensure_job_workers()
+    return app
+
+def _init_extensions(config=None):
+    config = config or {}
+    bound = 'sqlalchemy' in app.extensions
+    changed = [key for key in _BIND_TIME_CONFIG if bound and key in config and config[key] != app.config.get(key)]
+    if changed:
+        raise RuntimeError(f'{", ".join(changed)} применяются при импорте app.py: задайте их переменными окружения')
+    app.config.update(config)
+    if not bound:
+        db.init_app(app)
+        app.extensions['news_cache'] = _make_news_cache()
+        assets.init_app(app)
+        if app.config['JSON_PROVIDER'] == 'orjson':
+            json_provider.init_app(app)
+        if app.config['METRICS_ENABLED']:
+            metrics.init_app(
+                app,
+                app.config['METRICS_DIR'] or os.path.join(app.instance_path, 'metrics'),
+                slow_query_ms=app.config['SLOW_QUERY_MS'],
+                token=app.config['METRICS_TOKEN'],
+                public=app.config['METRICS_PUBLIC'],
+            )
+        log_setup.setup_logging(app.logger)
+
+def upgrade_db():
+    applied = migrations.upgrade(db.engine, db.metadata)
+    if applied:
+        app.logger.info(f'[DB] Применены миграции: {", ".join(applied)}')
+    return applied
+
+db_cli = AppGroup('db', help='Управление схемой базы данных.')
+
+@db_cli.command('upgrade')
+def db_upgrade_command():
+    """Применить недостающие миграции."""
+    applied = upgrade_db()
+    click.echo(f'Применены миграции: {", ".join(applied)}' if applied else 'Схема актуальна')
+
+@db_cli.command('current')
+def db_current_command():
+    """Показать текущую версию схемы."""
+    click.echo(f'Версия схемы: {migrations.current_version(db.engine)} (последняя: {migrations.HEAD})')
+
+app.cli.add_command(db_cli)
+
+assets_cli = AppGroup('assets', help='Сборка статических файлов.')
+
+@assets_cli.command('build')
+def assets_build_command():
+    """Собрать статику: варианты изображений, хэши в именах, сжатие."""
+    variants, manifest = assets.build(app.static_folder)
+    if variants:
+        click.echo(f'Изображения: {", ".join(variants)}')
+    elif assets.Image is None:
+        click.echo('Pillow не установлен: используются готовые варианты изображений')
+    click.echo(f'Файлов в манифесте: {len(manifest)}' + ('' if assets.brotli else ' (без brotli, только gzip)'))
+
+app.cli.add_command(assets_cli)
+
+_init_extensions()
 
 if __name__ == '__main__':
+    # Local development: keep the old "just run it" behaviour
+    with app.app_context():
+        upgrade_db()
+    create_app()
     app.run(debug=os.getenv('FLASK_DEBUG', '0') == '1', host='0.0.0.0', port=int(os.getenv('PORT', '8080')))
 
 
@@ -0,0 +1,146 @@
+"""Static asset pipeline.
+
+`flask --app app assets build` (run before gunicorn in the Procfile):
+- renders the image variants in IMAGE_VARIANTS (resized PNG + WebP) into
+  static/ when Pillow is installed; the outputs are committed, so a build
+  without Pillow still has them;
+- copies every static file to static/dist/ under a content-hashed name and
+  records logical -> hashed names in static/dist/manifest.json;
+- writes .gz (and .br when the brotli package is installed) next to the
+  hashed text assets.
+
+At runtime url_for('static', filename=...) returns the hashed name when the
+manifest lists it; hashed files are served with an immutable Cache-Control
+and the precompressed variant the client accepts.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import request, send_from_directory
+
+try:
+    from PIL import Image
+except ImportError:  # optional: variants are committed
+    Image = None
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+# source -> [(width, output)]; the logo is shown at 60-80 CSS px, 160 covers 2x screens
+IMAGE_VARIANTS = {
+    'logo.png': [(160, 'logo-160.png'), (160, 'logo-160.webp')],
+}
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt'}
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+def _render_variants(static_folder):
+    written = []
+    for source, variants in IMAGE_VARIANTS.items():
+        src = os.path.join(static_folder, source)
+        for width, name in variants:
+            out = os.path.join(static_folder, name)
+            if os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(src):
+                continue
+            with Image.open(src) as im:
+                height = round(im.height * width / im.width)
+                resized = im.resize((width, height), Image.LANCZOS)
+                if name.endswith('.webp'):
+                    resized.save(out, 'WEBP', quality=85, method=6)
+                else:
+                    resized.save(out, 'PNG', optimize=True)
+            written.append(name)
+    return written
+
+
+def _precompress(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    encoders = [('.gz', lambda b: gzip.compress(b, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoders.append(('.br', lambda b: brotli.compress(b, quality=11)))
+    for suffix, encode in encoders:
+        packed = encode(data)
+        if len(packed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(packed)
+
+
+def build(static_folder):
+    """Run the pipeline; returns (variants rendered, manifest)."""
+    variants = _render_variants(static_folder) if Image is not None else []
+
+    dist = os.path.join(static_folder, DIST)
+    shutil.rmtree(dist, ignore_errors=True)
+    os.makedirs(dist)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != dist]
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            logical = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()[:12]
+            stem, ext = os.path.splitext(logical)
+            hashed = f'{DIST}/{stem}.{digest}{ext}'
+            target = os.path.join(static_folder, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(path, target)
+            if ext in COMPRESSIBLE:
+                _precompress(target)
+            manifest[logical] = hashed
+
+    with open(os.path.join(dist, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return variants, manifest
+
+
+def load_manifest(static_folder):
+    try:
+        with open(os.path.join(static_folder, DIST, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def init_app(app):
+    """Fingerprint static URLs and serve hashed files; no-op until a build ran."""
+    manifest = load_manifest(app.static_folder)
+    if not manifest:
+        return
+    hashed = set(manifest.values())
+
+    @app.url_defaults
+    def _fingerprint_static(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    def static(filename):
+        if filename not in hashed:
+            return app.send_static_file(filename)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = path = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if request.accept_encodings[candidate] and os.path.exists(os.path.join(app.static_folder, filename + suffix)):
+                encoding, path = candidate, filename + suffix
+                break
+        response = send_from_directory(
+            app.static_folder, path or filename, mimetype=mimetype, max_age=IMMUTABLE_MAX_AGE
+        )
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        if os.path.splitext(filename)[1] in COMPRESSIBLE:
+            response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    app.view_functions['static'] = static
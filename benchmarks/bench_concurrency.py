@@ -0,0 +1,73 @@
+"""Concurrent write stress test: N threads submitting applications at once.
+
+Runs the same workload against a fresh SQLite database twice, once with the
+old defaults (rollback journal, synchronous=FULL) and once with the tuned
+settings (WAL, synchronous=NORMAL), and reports committed writes per second
+and failed requests.
+
+Usage: python benchmarks/bench_concurrency.py [writers] [submissions_per_writer]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKLOAD = '''
+import json, sys, threading, time
+from app import create_app, upgrade_db
+writers, per_writer = int(sys.argv[1]), int(sys.argv[2])
+app = create_app()
+with app.app_context():
+    upgrade_db()
+
+results = {'ok': 0, 'failed': 0}
+lock = threading.Lock()
+start_gate = threading.Barrier(writers)
+
+def writer(n):
+    client = app.test_client()
+    start_gate.wait()
+    for i in range(per_writer):
+        response = client.post('/recruitment/submit', json={
+            'last_name': 'Иванов', 'first_name': 'Иван', 'birth_date': '2000-01-01', 'r_age': '20',
+            'time_on_project': '1 год', 'previous_faction_experience': 'Нет', 'shooting_skills': '7',
+            'knowledge_of_law': 'Да', 'phone': '+70000000000',
+            'username': f'stress{n}_{i}', 'password': 'secret123',
+        })
+        with lock:
+            results['ok' if response.status_code == 200 else 'failed'] += 1
+
+threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+t0 = time.perf_counter()
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+elapsed = time.perf_counter() - t0
+print(json.dumps(dict(results, seconds=elapsed)))
+'''
+
+PROFILES = {
+    'default': {'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL'},
+    'tuned': {'SQLITE_JOURNAL_MODE': 'WAL', 'SQLITE_SYNCHRONOUS': 'NORMAL'},
+}
+
+
+def main():
+    writers = sys.argv[1] if len(sys.argv) > 1 else '8'
+    per_writer = sys.argv[2] if len(sys.argv) > 2 else '50'
+    print(f'writers={writers} submissions_per_writer={per_writer}')
+    for name, settings in PROFILES.items():
+        db_path = os.path.join(tempfile.mkdtemp(), 'bench_concurrency.db')
+        env = dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}', **settings)
+        out = subprocess.run([sys.executable, '-c', WORKLOAD, writers, per_writer],
+                             cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f'{name:<8} ok={r["ok"]:<5} failed={r["failed"]:<4} {r["ok"] / r["seconds"]:8.1f} writes/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Streaming export check: 100k synthetic applications under a memory ceiling.
+
+Seeds N rows (default 100000) into a fresh SQLite database, streams
+/api/admin/applications/export in both formats and fails if the Python heap
+peak (tracemalloc) while streaming exceeds the ceiling.
+
+Usage: python benchmarks/bench_export.py [rows] [ceiling_mb]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_export.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, upgrade_db, db, Recruitment  # noqa: E402
+
+
+def seed(rows):
+    start = datetime(2024, 1, 1)
+    table = Recruitment.__table__
+    for offset in range(0, rows, 5000):
+        db.session.execute(table.insert(), [
+            {
+                'last_name': f'Фамилия{i}', 'first_name': 'Имя', 'birth_date': '2000-01-01',
+                'phone': '+70000000000', 'knowledge_of_law': 'Устав ' * 80,
+                'additional_info': 'Дополнительно ' * 40, 'status': 'На рассмотрении',
+                'submission_date': start + timedelta(minutes=i),
+            }
+            for i in range(offset, min(offset + 5000, rows))
+        ])
+    db.session.commit()
+
+
+def stream(client, fmt):
+    response = client.get(f'/api/admin/applications/export?format={fmt}', buffered=False)
+    assert response.status_code == 200, response.status_code
+    size = lines = 0
+    for chunk in response.response:
+        size += len(chunk)
+        lines += chunk.count(b'\n')
+    response.close()
+    return size, lines
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    ceiling_mb = float(sys.argv[2]) if len(sys.argv) > 2 else 32
+    app = create_app()
+    with app.app_context():
+        upgrade_db()
+        seed(rows)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['admin_logged_in'] = True
+
+    failed = False
+    for fmt in ('csv', 'ndjson'):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        size, lines = stream(client, fmt)
+        elapsed = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak_mb = peak / 2 ** 20
+        ok = peak_mb <= ceiling_mb
+        failed |= not ok
+        print(f'{"ok  " if ok else "FAIL"} {fmt:<7} lines={lines} bytes={size} '
+              f'time={elapsed:.1f}s peak={peak_mb:.1f} MB (ceiling {ceiling_mb} MB)')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Group fan-out benchmark: per-row ORM adds vs. the chunked bulk insert path.
+
+Usage: python benchmarks/bench_fanout.py [members]
+"""
+import os
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_fanout.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, Recruitment, User, Group, GroupMember, CombatTask, _resolve_targets, _bulk_fan_out  # noqa: E402
+
+
+def seed(members):
+    group = Group(name='bench')
+    db.session.add(group)
+    db.session.flush()
+    for i in range(members):
+        r = Recruitment(last_name=f'L{i}', first_name='F', birth_date='2000-01-01', phone='0')
+        db.session.add(r)
+        db.session.flush()
+        u = User(recruitment_id=r.id, username=f'bench{i}', password='secret')
+        db.session.add(u)
+        db.session.flush()
+        db.session.add(GroupMember(group_id=group.id, user_id=u.id))
+    db.session.commit()
+    return group.id
+
+
+def orm_loop(group_id, values):
+    targets = [m.user_id for m in GroupMember.query.filter_by(group_id=group_id).all()]
+    for uid in targets:
+        db.session.add(CombatTask(user_id=uid, **values))
+    db.session.commit()
+    return len(targets)
+
+
+def bulk(group_id, values):
+    created = _bulk_fan_out(CombatTask, _resolve_targets(None, group_id), values)
+    db.session.commit()
+    return created
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    created = fn(*args)
+    return created, time.perf_counter() - start
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    values = {'title': 'Учения', 'description': 'x' * 200, 'status': 'new', 'priority': 'normal', 'due_date': None}
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        group_id = seed(members)
+        n_loop, t_loop = timed(orm_loop, group_id, values)
+        db.session.expunge_all()
+        n_bulk, t_bulk = timed(bulk, group_id, values)
+    print(f'members={members}')
+    print(f'orm_loop: {n_loop} rows in {t_loop * 1000:.1f} ms')
+    print(f'bulk:     {n_bulk} rows in {t_bulk * 1000:.1f} ms')
+    print(f'speedup:  {t_loop / t_bulk:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
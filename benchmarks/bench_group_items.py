@@ -0,0 +1,127 @@
+"""Group-addressed items: a copy per member vs one shared row (GROUP_ITEMS).
+
+Seeds two groups of `members` users, each user with personal tasks and
+notifications, then sends the same broadcasts (a notification and a task)
+to group A with GROUP_ITEMS=copy and to group B with GROUP_ITEMS=shared
+through the admin endpoints. Reported per strategy:
+- write: time until a broadcast is visible to every member (copy: until its
+  fan-out job finished) and rows written per broadcast;
+- read: p50/p95 of a member's notifications, tasks, unread count and
+  dashboard, after all broadcasts.
+
+Usage: python benchmarks/bench_group_items.py [members] [broadcasts] [reads]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_group_items.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['METRICS_ENABLED'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (  # noqa: E402
+    app, create_app, upgrade_db, db, Recruitment, User, Group, GroupMember, CombatTask, Notification, Job,
+)
+
+PERSONAL_ROWS = 20
+STRATEGIES = ('copy', 'shared')
+READS = ('/api/user/notifications', '/api/user/tasks', '/api/user/notifications/unread-count', '/api/user/dashboard')
+
+
+def seed(members):
+    start = datetime(2024, 1, 1)
+    users = members * len(STRATEGIES)
+
+    def insert(model, rows):
+        for offset in range(0, len(rows), 5000):
+            db.session.execute(model.__table__.insert(), rows[offset:offset + 5000])
+
+    insert(Recruitment, [
+        {'last_name': f'Фамилия{i}', 'first_name': 'Имя', 'birth_date': '2000-01-01',
+         'phone': f'+7999{i:07d}', 'status': 'Одобрено', 'submission_date': start}
+        for i in range(users)
+    ])
+    insert(User, [
+        {'recruitment_id': i + 1, 'username': f'user{i}', 'password': 'x', 'unread_notifications': PERSONAL_ROWS}
+        for i in range(users)
+    ])
+    insert(Group, [{'name': name} for name in STRATEGIES])
+    insert(GroupMember, [
+        {'group_id': g + 1, 'user_id': g * members + i + 1} for g in range(len(STRATEGIES)) for i in range(members)
+    ])
+    for model, values in ((CombatTask, {'title': 'Задача'}), (Notification, {'content': 'Уведомление', 'is_read': False})):
+        insert(model, [dict(values, user_id=uid, created_at=start) for uid in range(1, users + 1) for _ in range(PERSONAL_ROWS)])
+    db.session.commit()
+
+
+def row_count():
+    return sum(db.session.query(model.id).count() for model in (CombatTask, Notification))
+
+
+def broadcast(admin, group_id, n):
+    """Send one notification and one task; returns seconds until both are visible."""
+    started = time.perf_counter()
+    job_ids = []
+    for kind, body in (('notification', {'content': f'Рассылка {n}'}), ('task', {'title': f'Задача группы {n}'})):
+        response = admin.post(f'/api/admin/actions/{kind}', json=dict(body, group_id=group_id))
+        assert response.status_code in (201, 202), response.data
+        job_ids += [response.json['job_id']] if response.status_code == 202 else []
+    while job_ids:
+        with app.app_context():
+            status = db.session.get(Job, job_ids[0]).status
+        if status in ('done', 'failed'):
+            job_ids.pop(0)
+        else:
+            time.sleep(0.005)
+    return time.perf_counter() - started
+
+
+def percentile(values, q):
+    return sorted(values)[min(len(values) - 1, int(len(values) * q))]
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    broadcasts = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    reads = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    create_app({'TESTING': True})
+    with app.app_context():
+        upgrade_db()
+        seed(members)
+    admin = app.test_client()
+    with admin.session_transaction() as session:
+        session['admin_logged_in'] = True
+
+    print(f'{members} members per group, {PERSONAL_ROWS} personal tasks/notifications each, {broadcasts} broadcasts')
+    for g, strategy in enumerate(STRATEGIES):
+        app.config['GROUP_ITEMS'] = strategy
+        with app.app_context():
+            before = row_count()
+        seconds = [broadcast(admin, g + 1, n) for n in range(broadcasts)]
+        with app.app_context():
+            written = (row_count() - before) / broadcasts
+        print(f'{strategy}:')
+        print(f'  write  visible to all in p50 {statistics.median(seconds) * 1000:8.2f} ms   '
+              f'rows per broadcast {written:8.0f}')
+
+        member = app.test_client()
+        with member.session_transaction() as session:
+            session['user_id'] = g * members + 1
+        for path in READS:
+            for _ in range(reads // 10):  # warm-up
+                member.get(path)
+            timings = []
+            for _ in range(reads):
+                started = time.perf_counter()
+                assert member.get(path).status_code == 200
+                timings.append(time.perf_counter() - started)
+            print(f'  read   {path:<38} p50 {percentile(timings, 0.5) * 1000:6.2f} ms   '
+                  f'p95 {percentile(timings, 0.95) * 1000:6.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
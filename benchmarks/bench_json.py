@@ -0,0 +1,84 @@
+"""JSON provider and response compression on /api/applications.
+
+Seeds synthetic applications, then reports for a 200-row page:
+- serialization time of the payload with the stock Flask provider vs the
+  orjson provider (also for full to_dict() rows with their Text fields);
+- bytes on the wire for identity, gzip and br (brotli only when installed).
+
+Usage: python benchmarks/bench_json.py [rows] [repeats]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_json.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+import json_provider  # noqa: E402
+from app import create_app, upgrade_db, db, Recruitment, _recruitment_query  # noqa: E402
+
+PAGE = 200
+
+
+def seed(rows):
+    start = datetime(2024, 1, 1)
+    db.session.execute(Recruitment.__table__.insert(), [
+        {
+            'last_name': f'Фамилия{i}', 'first_name': 'Имя', 'middle_name': 'Отчество',
+            'birth_date': '2000-01-01', 'phone': f'+7999{i:07d}', 'knowledge_of_law': 'Устав ' * 80,
+            'additional_info': 'Дополнительно ' * 40, 'status': 'На рассмотрении',
+            'submission_date': start + timedelta(minutes=i),
+        }
+        for i in range(rows)
+    ])
+    db.session.commit()
+
+
+def time_dumps(provider, payload, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        provider.response(payload).get_data()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    app = create_app()
+    with app.app_context():
+        upgrade_db()
+        seed(rows)
+    client = app.test_client()
+
+    page = client.get(f'/api/applications?limit={PAGE}', headers={'Accept-Encoding': 'identity'}).json
+    with app.app_context():
+        full = [r.to_dict() for r in _recruitment_query().limit(PAGE).all()]
+
+    print(f'serialization, best of {repeats} ({PAGE} rows):')
+    stock = DefaultJSONProvider(app)
+    fast = json_provider.OrjsonProvider(app) if json_provider.orjson else None
+    for label, payload in (('list page', page), ('full rows', full)):
+        base = time_dumps(stock, payload, repeats)
+        line = f'  {label:<10} json {base:7.2f} ms'
+        if fast:
+            quick = time_dumps(fast, payload, repeats)
+            line += f'   orjson {quick:7.2f} ms   x{base / quick:.1f}'
+        print(line)
+    if not fast:
+        print('  orjson not installed')
+
+    print(f'bytes on the wire, GET /api/applications?limit={PAGE} (provider: {type(app.json).__name__}):')
+    for encoding in ('identity', 'gzip', 'br'):
+        response = client.get(f'/api/applications?limit={PAGE}', headers={'Accept-Encoding': encoding})
+        print(f'  {encoding:<9} {len(response.data):8d} B   Content-Encoding: {response.headers.get("Content-Encoding", "-")}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Startup benchmark: module import + create_app() and first-request latency.
+
+Each run is a fresh interpreter, as for a new gunicorn worker. The database is
+migrated once beforehand, so the numbers cover only what a worker pays.
+
+Usage: python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import json, time
+t0 = time.perf_counter()
+from app import create_app
+app = create_app()
+t1 = time.perf_counter()
+response = app.test_client().get('/api/news')
+t2 = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({'import_ms': (t1 - t0) * 1000, 'first_request_ms': (t2 - t1) * 1000}))
+'''
+
+
+def run(code, env):
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, check=True, capture_output=True, text=True)
+    return out.stdout.strip().splitlines()[-1]
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    env = dict(os.environ, DATABASE_URL=f'sqlite:///{os.path.join(tempfile.mkdtemp(), "bench_startup.db")}')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'], cwd=ROOT, env=env, check=True, capture_output=True)
+    samples = [json.loads(run(PROBE, env)) for _ in range(runs)]
+    for key in ('import_ms', 'first_request_ms'):
+        values = [s[key] for s in samples]
+        print(f'{key:<17} median={statistics.median(values):7.1f}  max={max(values):7.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Latency benchmark for POST /recruitment/submit (p50/p99).
+
+Sends N sequential submissions with unique logins through the Flask test
+client, plus the same number of idempotent retries, against a fresh SQLite
+database.
+
+Usage: python benchmarks/bench_submit.py [requests]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_submit.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, upgrade_db  # noqa: E402
+
+FORM = {
+    'last_name': 'Иванов', 'first_name': 'Иван', 'birth_date': '2000-01-01', 'r_age': '20',
+    'time_on_project': '1 год', 'previous_faction_experience': 'Нет', 'shooting_skills': '7',
+    'knowledge_of_law': 'Знаю устав ' * 50, 'phone': '+70000000000', 'password': 'secret123',
+}
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def measure(client, n):
+    latencies = []
+    for i in range(n):
+        start = time.perf_counter()
+        response = client.post('/recruitment/submit', json=dict(FORM, username=f'bench{i}'),
+                               headers={'Idempotency-Key': f'bench-{i}'})
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.get_json()
+    return latencies
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    app = create_app()
+    with app.app_context():
+        upgrade_db()
+    client = app.test_client()
+    # Second pass repeats the same keys, i.e. client retries
+    for name in ('submit', 'retry'):
+        latencies = measure(client, n)
+        print(f'{name:<7} n={n} p50={statistics.median(latencies):6.2f} ms  '
+              f'p99={percentile(latencies, 99):6.2f} ms  max={max(latencies):6.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
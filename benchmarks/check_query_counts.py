@@ -0,0 +1,115 @@
+"""Check that list endpoints run a fixed number of SQL statements.
+
+Seeds a small dataset, records the per-request statement count of each
+endpoint (X-Query-Count, QUERY_COUNT_HEADER=1), grows every table the
+endpoints read tenfold and fails if any count changed: a count that follows
+the data size is an N+1 query.
+
+Usage: python benchmarks/check_query_counts.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'check_query_counts.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['QUERY_COUNT_HEADER'] = '1'
+os.environ['METRICS_ENABLED'] = '0'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (  # noqa: E402
+    create_app, upgrade_db, db, Recruitment, User, Group, GroupMember, CombatTask, Assignment, Notification,
+    DaySchedule, ScheduleTemplate, ScheduleOverride, GroupItemState, GROUP_ITEM_TYPES,
+)
+
+SMALL = 5
+SCALE = 10
+USER_ID = 1  # member of both groups, reads the dashboard
+GROUPS = 2
+
+# (path, session): admin or the user's session
+ENDPOINTS = (
+    ('/api/applications', 'admin'),
+    ('/api/admin/groups/1/members', 'admin'),
+    ('/api/user/dashboard', 'user'),
+)
+
+
+def grow(n):
+    """Add n applications (and users), group members and user/group rows."""
+    start = datetime(2024, 1, 1)
+    first = db.session.query(db.func.count(Recruitment.id)).scalar()
+
+    def insert(model, rows):
+        for offset in range(0, len(rows), 5000):
+            db.session.execute(model.__table__.insert(), rows[offset:offset + 5000])
+
+    insert(Recruitment, [
+        {'last_name': f'Фамилия{i}', 'first_name': 'Имя', 'birth_date': '2000-01-01', 'phone': f'+7999{i:07d}',
+         'status': ('На рассмотрении', 'Одобрено')[i % 2], 'submission_date': start + timedelta(minutes=i)}
+        for i in range(first, first + n)
+    ])
+    insert(User, [
+        {'recruitment_id': i + 1, 'username': f'user{i}', 'password': 'x', 'created_date': start}
+        for i in range(first, first + n)
+    ])
+    if not first:
+        insert(Group, [{'name': f'Группа {g}'} for g in range(GROUPS)])
+        insert(GroupMember, [{'group_id': g + 1, 'user_id': USER_ID} for g in range(GROUPS)])
+    insert(GroupMember, [{'group_id': 1, 'user_id': i + 1} for i in range(max(first, 1), first + n)])
+
+    for model, values in ((CombatTask, {'title': 'Задача'}), (Assignment, {'title': 'Поручение'}),
+                          (Notification, {'content': 'Уведомление', 'is_read': False})):
+        insert(model, [dict(values, user_id=USER_ID, created_at=start) for _ in range(n)])
+        insert(model, [dict(values, group_id=g + 1, created_at=start) for g in range(GROUPS) for _ in range(n)])
+    shared = db.session.scalars(
+        db.select(Notification.id).where(Notification.group_id.isnot(None)).order_by(Notification.id.desc()).limit(n)
+    ).all()
+    insert(GroupItemState, [
+        {'item_type': GROUP_ITEM_TYPES[Notification], 'item_id': item_id, 'user_id': USER_ID, 'is_read': True}
+        for item_id in shared
+    ])
+    insert(DaySchedule, [{'user_id': USER_ID, 'day': f'День {first + i}', 'wake_up': '06:00'} for i in range(n)])
+    insert(ScheduleTemplate, [{'group_id': 1, 'day': f'День {first + i}', 'duty': 'КПП'} for i in range(n)])
+    templates = db.session.scalars(db.select(ScheduleTemplate.id).order_by(ScheduleTemplate.id.desc()).limit(n)).all()
+    insert(ScheduleOverride, [{'template_id': t, 'user_id': USER_ID, 'duty': 'Штаб'} for t in templates])
+    db.session.commit()
+
+
+def query_counts(clients):
+    counts = {}
+    for path, who in ENDPOINTS:
+        response = clients[who].get(path)
+        assert response.status_code == 200, (path, response.status_code)
+        counts[path] = int(response.headers['X-Query-Count'])
+    return counts
+
+
+def main():
+    app = create_app({'TESTING': True})
+    with app.app_context():
+        upgrade_db()
+        grow(SMALL)
+    clients = {'admin': app.test_client(), 'user': app.test_client()}
+    with clients['admin'].session_transaction() as session:
+        session['admin_logged_in'] = True
+    with clients['user'].session_transaction() as session:
+        session['user_id'] = USER_ID
+
+    small = query_counts(clients)
+    with app.app_context():
+        grow(SMALL * SCALE - SMALL)
+    large = query_counts(clients)
+
+    failures = 0
+    for path, _ in ENDPOINTS:
+        ok = small[path] == large[path]
+        failures += not ok
+        print(f'{"ok  " if ok else "FAIL"} {path:<48} {small[path]:3d} statements at {SMALL} rows, '
+              f'{large[path]:3d} at {SMALL * SCALE}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Check that the hot query paths use their indexes (SQLite EXPLAIN QUERY PLAN).
+
+Builds a fresh database through the migrations, compiles the same query shapes
+the endpoints run and fails if a plan falls back to a full table scan, sorts
+in a temporary b-tree or misses the expected index.
+
+Usage: python benchmarks/explain_indexes.py
+"""
+import os
+import sys
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'explain_indexes.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (  # noqa: E402
+    create_app, upgrade_db, db, Recruitment, News, User, CombatTask, Assignment, Notification,
+    DaySchedule, GroupMember, Job, ScheduleTemplate, ScheduleOverride, GroupItemState, _user_page_stmt,
+)
+
+SINCE = db.literal_column("'2024-01-01 00:00:00'")
+
+
+def checks():
+    yield 'user tasks', 'ix_combat_task_user_id_id', (
+        db.select(CombatTask).where(CombatTask.user_id == 1).order_by(CombatTask.id.desc()).limit(50))
+    yield 'user tasks since', 'ix_combat_task_user_id_id', (
+        db.select(CombatTask).where(CombatTask.user_id == 1, CombatTask.id > 10).order_by(CombatTask.id.asc()).limit(50))
+    yield 'user assignments', 'ix_assignment_user_id_id', (
+        db.select(Assignment).where(Assignment.user_id == 1).order_by(Assignment.id.desc()).limit(50))
+    yield 'user notifications', 'ix_notification_user_id_id', (
+        db.select(Notification).where(Notification.user_id == 1).order_by(Notification.id.desc()).limit(50))
+    yield 'unread notifications', 'ix_notification_user_id_is_read', (
+        db.select(Notification.id).where(Notification.user_id == 1, Notification.is_read.is_(False)))
+    yield 'user schedule', 'ix_day_schedule_user_id', (
+        db.select(DaySchedule).where(DaySchedule.user_id == 1))
+    yield 'group tasks', 'ix_combat_task_group_id_id', (
+        _user_page_stmt(CombatTask, False, False, False, 2).params(uid=1, limit=50, group_0=1, group_1=2))
+    yield 'group notifications', 'uq_group_item_state_item_user', (
+        _user_page_stmt(Notification, False, False, True, 1).params(uid=1, limit=50, before=100, group_0=1))
+    yield 'group item states', 'ix_group_item_state_user_id', (
+        db.select(db.func.max(GroupItemState.updated_at)).where(GroupItemState.user_id == 1))
+    yield 'group schedule', 'ix_schedule_template_group_id_id', (
+        db.select(ScheduleTemplate.id, db.func.coalesce(ScheduleOverride.duty, ScheduleTemplate.duty))
+        .join(GroupMember, (GroupMember.group_id == ScheduleTemplate.group_id) & (GroupMember.user_id == 1))
+        .outerjoin(ScheduleOverride, (ScheduleOverride.template_id == ScheduleTemplate.id) & (ScheduleOverride.user_id == 1)))
+    yield 'schedule overrides', 'ix_schedule_override_user_id', (
+        db.select(db.func.count(ScheduleOverride.id)).where(ScheduleOverride.user_id == 1))
+    yield 'group targets', 'uq_group_member_group_user', (
+        db.select(GroupMember.user_id).where(GroupMember.group_id == 1))
+    yield 'group members page', 'uq_group_member_group_user', (
+        db.select(GroupMember.id, GroupMember.user_id, User.username)
+        .join(User, User.id == GroupMember.user_id)
+        .where(GroupMember.group_id == 1, GroupMember.user_id > 100)
+        .order_by(GroupMember.user_id).limit(101))
+    yield 'user groups', 'ix_group_member_user_id', (
+        db.select(GroupMember.group_id).where(GroupMember.user_id == 1))
+    yield 'applications page', 'ix_recruitment_submission_date_id', (
+        db.select(Recruitment.id, Recruitment.status, User.username)
+        .outerjoin(User, User.recruitment_id == Recruitment.id)
+        .where(db.tuple_(Recruitment.submission_date, Recruitment.id) < db.tuple_(SINCE, 100))
+        .order_by(Recruitment.submission_date.desc(), Recruitment.id.desc()).limit(51))
+    yield 'applications by status', 'ix_recruitment_status_submission_date_id', (
+        db.select(Recruitment.id)
+        .where(Recruitment.status == 'На рассмотрении')
+        .order_by(Recruitment.submission_date.desc(), Recruitment.id.desc()).limit(51))
+    yield 'stats by status', 'ix_recruitment_status_submission_date_id', (
+        db.select(Recruitment.status, db.func.count(Recruitment.id)).group_by(Recruitment.status))
+    yield 'latest news', 'ix_news_date_id', (
+        db.select(News).order_by(News.date.desc()).limit(10))
+    yield 'news archive page', 'ix_news_date_id', (
+        db.select(News.id, News.title).where(db.tuple_(News.date, News.id) < db.tuple_(SINCE, 100))
+        .order_by(News.date.desc(), News.id.desc()).limit(21))
+    yield 'news archive by category', 'ix_news_category_date_id', (
+        db.select(News.id, News.title).where(News.category == 'Учения')
+        .order_by(News.date.desc(), News.id.desc()).limit(21))
+    yield 'job claim', 'ix_job_status_id', (
+        db.select(Job.id).where(Job.status == 'queued').order_by(Job.id).limit(1))
+
+
+def main():
+    failures = 0
+    app = create_app()
+    with app.app_context():
+        upgrade_db()
+        with db.engine.connect() as conn:
+            for name, index, stmt in checks():
+                sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={'literal_binds': True}))
+                plan = [row[-1] for row in conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}')]
+                # SCAN of a CO-ROUTINE reads the rows its subquery produced, not a table
+                subqueries = {p.split()[1] for p in plan if p.startswith('CO-ROUTINE ')}
+                full_scans = [p for p in plan
+                              if p.startswith('SCAN ') and ' USING ' not in p and p.split()[1] not in subqueries]
+                sorts = [p for p in plan if 'USE TEMP B-TREE' in p]
+                ok = any(index in p for p in plan) and not full_scans and not sorts
+                failures += not ok
+                print(f'{"ok  " if ok else "FAIL"} {name:<24} {" | ".join(plan)}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
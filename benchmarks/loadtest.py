@@ -0,0 +1,409 @@
+"""Load test for the whole app: seed a synthetic dataset, drive the real
+endpoints at a fixed concurrency and write a machine-readable baseline.
+
+The dataset (sizes configurable) holds applications, user accounts, groups
+with members, combat tasks, notifications and news. Each scenario below is
+run on its own for --requests requests (--fanout-requests for the fan-out
+actions, which each queue a job) by --concurrency threads, each
+thread logged in as a different seeded user, through the Flask test client
+(default) or a local gunicorn (--target gunicorn).
+
+The report is JSON: per scenario throughput, error count and p50/p95/p99/
+mean latency in ms, plus how long the queued fan-out jobs took to drain.
+With --compare it also checks against an earlier report and exits 1 when
+any scenario's p95 grew or its throughput fell by more than --tolerance.
+
+Usage:
+  python benchmarks/loadtest.py --output baseline.json
+  python benchmarks/loadtest.py --compare baseline.json
+  python benchmarks/loadtest.py --database-url postgresql://localhost/bench --target gunicorn
+
+--database-url must point at a scratch database: it is migrated and seeded.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix='loadtest-')
+PASSWORD = 'secret123'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database-url', help='default: a fresh SQLite file in a temp dir')
+    parser.add_argument('--target', choices=['client', 'gunicorn'], default='client')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--applications', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=10)
+    parser.add_argument('--members', type=int, default=200, help='members per group')
+    parser.add_argument('--tasks', type=int, default=10, help='combat tasks per user')
+    parser.add_argument('--notifications', type=int, default=20, help='notifications per user')
+    parser.add_argument('--news', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=400, help='requests per scenario')
+    parser.add_argument('--fanout-requests', type=int, default=50, help='requests per fan-out scenario')
+    parser.add_argument('--scenarios', help='comma-separated subset of the scenarios')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the report here (default: stdout)')
+    parser.add_argument('--compare', help='earlier report to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args()
+    args.users = min(args.users, args.applications)
+    args.members = min(args.members, args.users)
+    return args
+
+
+# -------- Dataset --------
+def seed(app_module, args):
+    """Bulk-insert the synthetic dataset; returns the seeded usernames."""
+    db = app_module.db
+    rng = random.Random(args.seed)
+    start = datetime(2024, 1, 1)
+
+    def insert(model, rows):
+        for offset in range(0, len(rows), 5000):
+            db.session.execute(model.__table__.insert(), rows[offset:offset + 5000])
+
+    if db.session.query(app_module.Recruitment.id).first() is not None:
+        sys.exit('database is not empty; --database-url must point at a scratch database')
+
+    insert(app_module.Recruitment, [
+        {
+            'last_name': f'Фамилия{i}', 'first_name': 'Имя', 'middle_name': 'Отчество',
+            'birth_date': '2000-01-01', 'phone': f'+7999{i:07d}', 'knowledge_of_law': 'Устав ' * 40,
+            'additional_info': 'Дополнительно ' * 20, 'status': rng.choice(['На рассмотрении', 'Одобрено', 'Отклонено']),
+            'submission_date': start + timedelta(minutes=i),
+        }
+        for i in range(args.applications)
+    ])
+    recruitment_ids = [r for (r,) in db.session.query(app_module.Recruitment.id).order_by(app_module.Recruitment.id)]
+    usernames = [f'user{i}' for i in range(args.users)]
+    insert(app_module.User, [
+        {'recruitment_id': rid, 'username': name, 'password': PASSWORD, 'created_date': start,
+         'unread_notifications': args.notifications}
+        for rid, name in zip(recruitment_ids, usernames)
+    ])
+    user_ids = [u for (u,) in db.session.query(app_module.User.id).order_by(app_module.User.id)]
+
+    insert(app_module.Group, [{'name': f'Группа {g}', 'created_at': start} for g in range(args.groups)])
+    group_ids = [g for (g,) in db.session.query(app_module.Group.id).order_by(app_module.Group.id)]
+    insert(app_module.GroupMember, [
+        {'group_id': gid, 'user_id': uid, 'added_at': start}
+        for gid in group_ids for uid in rng.sample(user_ids, args.members)
+    ])
+    insert(app_module.CombatTask, [
+        {'user_id': uid, 'title': f'Задача {n}', 'description': 'Описание ' * 10, 'created_at': start}
+        for uid in user_ids for n in range(args.tasks)
+    ])
+    insert(app_module.Notification, [
+        {'user_id': uid, 'content': f'Уведомление {n}', 'is_read': False, 'created_at': start}
+        for uid in user_ids for n in range(args.notifications)
+    ])
+    insert(app_module.DaySchedule, [
+        {'user_id': uid, 'day': 'Понедельник', 'wake_up': '06:00', 'training': '08:00-12:00',
+         'duty': '14:00-18:00', 'rest': '18:00-21:00', 'lights_out': '22:00'}
+        for uid in user_ids
+    ])
+    insert(app_module.News, [
+        {'title': f'Новость {n}', 'content': 'Текст новости ' * 50, 'category': rng.choice(['Новости', 'Учения']),
+         'author': 'Администратор', 'date': start + timedelta(hours=n)}
+        for n in range(args.news)
+    ])
+    db.session.commit()
+    return usernames, group_ids
+
+
+# -------- Clients --------
+class TestClientSession:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json_body=None, form=None):
+        response = self.client.open(path, method=method, json=json_body, data=form)
+        return response.status_code, response.get_data()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect()
+        )
+
+    def request(self, method, path, json_body=None, form=None):
+        headers, data = {}, None
+        if json_body is not None:
+            data, headers['Content-Type'] = json.dumps(json_body).encode(), 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def login_user(session, username):
+    status, _ = session.request('POST', '/login', form={'username': username, 'password': PASSWORD})
+    assert status == 302, f'user login failed: {status}'
+
+
+def login_admin(session):
+    form = {'username': os.getenv('ADMIN_USERNAME', 'admin'), 'password': os.getenv('ADMIN_PASSWORD', 'e41J6_Xs')}
+    status, _ = session.request('POST', '/admin/login', form=form)
+    assert status == 302, f'admin login failed: {status}'
+
+
+# -------- Scenarios --------
+# name -> (session kind, build request(n, ctx) -> (method, path, json_body))
+def _submission(n, ctx):
+    return 'POST', '/recruitment/submit', {
+        'last_name': 'Иванов', 'first_name': 'Иван', 'birth_date': '2000-01-01', 'r_age': '20',
+        'time_on_project': '1 год', 'previous_faction_experience': 'Нет', 'shooting_skills': '7',
+        'knowledge_of_law': 'Да', 'phone': '+70000000000',
+        'username': f'load{ctx["run"]}_{n}', 'password': PASSWORD,
+    }
+
+
+SCENARIOS = {
+    'submit_recruitment': ('anonymous', _submission),
+    'applications_page': ('admin', lambda n, ctx: ('GET', '/api/applications?limit=50', None)),
+    'applications_by_status': ('admin', lambda n, ctx: (
+        'GET', '/api/applications?' + urllib.parse.urlencode({'limit': 50, 'status': 'Одобрено'}), None)),
+    'user_dashboard': ('user', lambda n, ctx: ('GET', '/api/user/dashboard', None)),
+    'user_tasks': ('user', lambda n, ctx: ('GET', '/api/user/tasks', None)),
+    'user_notifications': ('user', lambda n, ctx: ('GET', '/api/user/notifications', None)),
+    'user_unread_count': ('user', lambda n, ctx: ('GET', '/api/user/notifications/unread-count', None)),
+    'user_schedule': ('user', lambda n, ctx: ('GET', '/api/user/schedule', None)),
+    'fanout_task': ('admin', lambda n, ctx: (
+        'POST', '/api/admin/actions/task', {'group_id': ctx['groups'][n % len(ctx['groups'])], 'title': f'Нагрузка {n}'})),
+    'fanout_notification': ('admin', lambda n, ctx: (
+        'POST', '/api/admin/actions/notification', {'group_id': ctx['groups'][n % len(ctx['groups'])], 'content': f'Нагрузка {n}'})),
+    'news_latest': ('anonymous', lambda n, ctx: ('GET', '/api/news', None)),
+    'news_archive': ('anonymous', lambda n, ctx: ('GET', '/api/news/archive?limit=20', None)),
+}
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(name, sessions, ctx, total):
+    _, build = SCENARIOS[name]
+    counter = iter(range(total))
+    lock = threading.Lock()
+    latencies, errors, job_ids = [], [0], []
+    gate = threading.Barrier(len(sessions) + 1)
+
+    def worker(session):
+        gate.wait()
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            method, path, body = build(n, ctx)
+            started = time.perf_counter()
+            try:
+                status, data = session.request(method, path, json_body=body)
+            except OSError:  # connection refused/reset, timeout
+                status, data = 599, b''
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors[0] += 1
+                elif status == 202:
+                    job_ids.append(json.loads(data)['job_id'])
+
+    threads = [threading.Thread(target=worker, args=(s,)) for s in sessions]
+    for t in threads:
+        t.start()
+    gate.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 2)  # noqa: E731
+    return {
+        'requests': total,
+        'errors': errors[0],
+        'seconds': round(seconds, 3),
+        'throughput_rps': round(total / seconds, 1),
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'mean_ms': ms(sum(latencies) / len(latencies)),
+    }, job_ids
+
+
+def wait_for_jobs(admin, job_ids, timeout=600):
+    # Workers claim jobs in id order, so polling the oldest unfinished one at
+    # a time keeps the harness from competing with them for the database
+    started = time.perf_counter()
+    pending = sorted(job_ids)
+    while pending and time.perf_counter() - started < timeout:
+        status, data = admin.request('GET', f'/api/admin/jobs/{pending[0]}')
+        if status == 200 and json.loads(data)['status'] in ('done', 'failed'):
+            pending.pop(0)
+        else:
+            time.sleep(0.05)
+    return round(time.perf_counter() - started, 3), len(pending)
+
+
+# -------- Targets --------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(args):
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'app:create_app()', f'--workers={args.workers}',
+         f'--threads={args.threads}', f'--bind=127.0.0.1:{port}', '--timeout=120'],
+        cwd=ROOT, env=dict(os.environ), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return proc, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    sys.exit('gunicorn did not start')
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, tolerance):
+    for key in ('target', 'database', 'concurrency', 'dataset'):
+        if baseline.get('meta', {}).get(key) != report['meta'][key]:
+            print(f'warning: baseline was run with a different {key}; numbers are not comparable', file=sys.stderr)
+    failed = False
+    for name, now in report['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        p95 = now['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0
+        rps = now['throughput_rps'] / before['throughput_rps'] - 1 if before['throughput_rps'] else 0
+        bad = p95 > tolerance or rps < -tolerance or now['errors'] > before['errors']
+        failed |= bad
+        print(f'{"FAIL" if bad else "ok  "} {name:<24} p95 {before["p95_ms"]:8.2f} -> {now["p95_ms"]:8.2f} ms ({p95:+.0%})'
+              f'   rps {before["throughput_rps"]:8.1f} -> {now["throughput_rps"]:8.1f} ({rps:+.0%})', file=sys.stderr)
+    return not failed
+
+
+def main():
+    args = parse_args()
+    os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{os.path.join(WORK_DIR, "loadtest.db")}'
+    os.environ.setdefault('METRICS_DIR', os.path.join(WORK_DIR, 'metrics'))
+    os.environ.setdefault('NEWS_CACHE_DIR', os.path.join(WORK_DIR, 'news_cache'))
+    sys.path.insert(0, ROOT)
+    import app as app_module
+
+    flask_app = app_module.create_app()
+    with flask_app.app_context():
+        app_module.upgrade_db()
+        usernames, group_ids = seed(app_module, args)
+        dialect = app_module.db.engine.dialect.name
+
+    server = None
+    if args.target == 'gunicorn':
+        server, base_url = start_gunicorn(args)
+        new_session = lambda: HttpSession(base_url)  # noqa: E731
+    else:
+        new_session = lambda: TestClientSession(flask_app)  # noqa: E731
+
+    names = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    ctx = {'groups': group_ids, 'run': int(time.time())}
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'target': args.target if args.target == 'client' else f'gunicorn {args.workers}x{args.threads}',
+            'database': dialect,
+            'concurrency': args.concurrency,
+            'requests_per_scenario': args.requests,
+            'requests_per_fanout_scenario': args.fanout_requests,
+            'dataset': {k: getattr(args, k) for k in ('applications', 'users', 'groups', 'members', 'tasks', 'notifications', 'news')},
+        },
+        'scenarios': {},
+    }
+    job_ids = []
+    try:
+        admin = new_session()
+        login_admin(admin)
+        for name in names:
+            kind = SCENARIOS[name][0]
+            sessions = [new_session() for _ in range(args.concurrency)]
+            for i, session in enumerate(sessions):
+                if kind == 'admin':
+                    login_admin(session)
+                elif kind == 'user':
+                    login_user(session, usernames[i % len(usernames)])
+            total = args.fanout_requests if name.startswith('fanout_') else args.requests
+            result, jobs = run_scenario(name, sessions, ctx, total)
+            report['scenarios'][name] = result
+            job_ids += jobs
+            print(f'{name:<24} {result["throughput_rps"]:8.1f} rps  p50 {result["p50_ms"]:7.2f}  '
+                  f'p95 {result["p95_ms"]:7.2f}  p99 {result["p99_ms"]:7.2f} ms  errors {result["errors"]}', file=sys.stderr)
+        if job_ids:
+            seconds, unfinished = wait_for_jobs(admin, job_ids)
+            report['jobs'] = {'queued': len(job_ids), 'drain_seconds': seconds, 'unfinished': unfinished}
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Response cache with pluggable storage.
+
+LRUCache keeps entries in the current process only; FileSystemCache stores
+them in a directory every gunicorn worker can read, so an invalidation in one
+worker is seen by all. ResponseCache namespaces keys by a generation token:
+invalidating writes a new token (besides dropping stored entries), so a
+response computed from pre-invalidation data by a slower request can never
+be served afterwards.
+"""
+import hashlib
+import os
+import pickle
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, maxsize=256, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """ttl=None uses the cache default; 0 means the entry never expires."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileSystemCache:
+    def __init__(self, directory, ttl=60):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                expires_at, value = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            return None
+        if expires_at is not None and expires_at < time.time():
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        # Write-then-rename, so readers in other processes never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((time.time() + ttl if ttl else None, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(key))
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith('.cache'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+
+class ResponseCache:
+    _GENERATION_KEY = '__generation__'
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def generation(self):
+        generation = self.backend.get(self._GENERATION_KEY)
+        if generation is None:
+            generation = self.invalidate()
+        return generation
+
+    def get(self, generation, key):
+        return self.backend.get(f'{generation}:{key}')
+
+    def set(self, generation, key, value):
+        self.backend.set(f'{generation}:{key}', value)
+
+    def invalidate(self):
+        self.backend.clear()
+        generation = secrets.token_hex(8)
+        self.backend.set(self._GENERATION_KEY, generation, ttl=0)
+        return generation
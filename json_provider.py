@@ -0,0 +1,50 @@
+"""Flask JSON provider backed by orjson, when it is installed.
+
+Output matches the stock provider's: sorted keys and the same `default`
+hook (so datetimes still render as HTTP dates), except that non-ASCII text
+is emitted as UTF-8 rather than \\u escapes. Values orjson can't encode
+(e.g. integers over 64 bits) fall back to the stdlib encoder.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: the stock provider is used
+    orjson = None
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    def _encode(self, obj, indent=False):
+        options = _OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(obj, default=self.default, option=options)
+        except TypeError:
+            layout = {'indent': 2} if indent else {'separators': (',', ':')}
+            return super().dumps(obj, ensure_ascii=False, **layout).encode()
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._encode(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+def init_app(app):
+    """Register the fastest available provider; returns its name."""
+    if orjson is None:
+        return 'json'
+    app.json_provider_class = OrjsonProvider
+    app.json = OrjsonProvider(app)
+    return 'orjson'
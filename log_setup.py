@@ -0,0 +1,120 @@
+"""Non-blocking structured logging.
+
+Request threads only put the raw LogRecord on a bounded queue; a
+QueueListener thread does the redaction, JSON formatting and the write to the
+sink. A forked child (gunicorn --preload) starts a listener of its own. Events are logged as dicts with an 'event' key, e.g.
+app.logger.info({'event': 'recruitment_submitted', 'recruitment_id': 1}).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+# Never written out, at any nesting depth
+REDACTED_FIELDS = {'password', 'passport_series', 'passport_number', 'idempotency_key'}
+# Long free-text values (payload Text columns) are cut to this many characters
+MAX_FIELD_LENGTH = 200
+
+
+def _parse_sample_rates(value):
+    """'event=rate,...' -> {event: rate}; e.g. 'recruitment_submitted=0.1'."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, rate = item.partition('=')
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def redact(value):
+    if isinstance(value, dict):
+        return {k: ('***' if k in REDACTED_FIELDS else redact(v)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    if isinstance(value, str) and len(value) > MAX_FIELD_LENGTH:
+        return f'{value[:MAX_FIELD_LENGTH]}…(+{len(value) - MAX_FIELD_LENGTH})'
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+        }
+        if isinstance(record.msg, dict):
+            entry.update(redact(record.msg))
+        else:
+            entry['message'] = redact(record.getMessage())
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of high-volume INFO/DEBUG events; warnings always pass."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not isinstance(record.msg, dict):
+            return True
+        rate = self.rates.get(record.msg.get('event'))
+        return rate is None or random.random() < rate
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records as-is and drops them when the queue is full.
+
+    The stock QueueHandler formats in prepare(), i.e. on the request thread,
+    and a full queue would raise; both defeat the point of queuing.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(logger, stream=None):
+    """Route `logger` through a queue to a JSON sink on a listener thread."""
+    sink = logging.StreamHandler(stream or sys.stderr)
+    sink.setFormatter(JsonFormatter())
+
+    queue_size = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    handler.addFilter(SamplingFilter(_parse_sample_rates(os.getenv('LOG_SAMPLE_RATES', ''))))
+    listeners = []
+
+    def start_listener():
+        # Threads do not survive fork(): the child needs its own listener, and
+        # a fresh queue, since the copied one may hold a lock taken by the
+        # parent's listener and records the parent writes itself
+        handler.queue = queue.Queue(maxsize=queue_size)
+        listeners[:] = [logging.handlers.QueueListener(handler.queue, sink, respect_handler_level=True)]
+        listeners[0].start()
+
+    start_listener()
+    atexit.register(lambda: listeners[0].stop())
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=start_listener)
+
+    logger.handlers = [handler]
+    logger.setLevel(os.getenv('LOG_LEVEL', 'INFO'))
+    logger.propagate = False
+    return handler
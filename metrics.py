@@ -0,0 +1,338 @@
+"""Per-request metrics in the Prometheus text format.
+
+Each process keeps counters and histograms in memory and snapshots them to
+<METRICS_DIR>/worker-<pid>-<id>.json at most once a second (and at exit); the
+random id keeps a reused pid from overwriting a dead worker's file. /metrics
+sums every snapshot in the directory, so the scrape is the same whichever
+gunicorn worker answers it. Snapshots of exited workers are folded into
+archive.json, so counts from restarted workers are kept, as Prometheus
+expects of counters, without the directory growing with every restart.
+
+Recorded per request: latency, SQL statement count and time spent in SQL,
+labelled by Flask endpoint. Pool checkouts are timed by TimedQueuePool.
+With SLOW_QUERY_MS set, slower statements are logged with their route.
+"""
+import atexit
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from flask import Response, abort, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+
+ARCHIVE_FILE = 'archive.json'
+ARCHIVE_LOCK = 'archive.lock'
+ARCHIVE_LOCK_TIMEOUT = 60  # seconds; a lock older than this was left by a crash
+
+HELP = {
+    'http_requests_total': ('counter', 'Requests by endpoint, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'Request handling time (streams: until the stream ends).'),
+    'http_request_queries': ('histogram', 'SQL statements executed per request.'),
+    'http_request_sql_seconds': ('histogram', 'Time spent in SQL per request.'),
+    'db_pool_checkout_wait_seconds': ('histogram', 'Time to check a connection out of the pool.'),
+    'db_pool_checkout_timeouts_total': ('counter', 'Checkouts that gave up after pool_timeout.'),
+    'db_slow_queries_total': ('counter', 'Statements slower than SLOW_QUERY_MS.'),
+}
+
+
+class Registry:
+    """Counters and histograms keyed by (name, sorted label pairs)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels=(), value=1):
+        key = (name, tuple(sorted(labels)))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets, labels=()):
+        key = (name, tuple(sorted(labels)))
+        with self._lock:
+            state = self.histograms.get(key)
+            if state is None:
+                state = self.histograms[key] = {'buckets': list(buckets), 'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(state['buckets']):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, labels, v] for (name, labels), v in self.counters.items()],
+                'histograms': [[name, labels, dict(s, counts=list(s['counts']))] for (name, labels), s in self.histograms.items()],
+            }
+
+
+REGISTRY = Registry()
+
+# A forked worker (gunicorn --preload) starts from zero: the parent's counts
+# are already in the parent's own snapshot
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=REGISTRY.reset)
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            REGISTRY.inc('db_pool_checkout_timeouts_total')
+            raise
+        finally:
+            REGISTRY.observe('db_pool_checkout_wait_seconds', time.perf_counter() - started, POOL_WAIT_BUCKETS)
+
+
+def _merge(snapshots):
+    counters, histograms = {}, {}
+    for snap in snapshots:
+        for name, labels, value in snap['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, state in snap['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, {'buckets': state['buckets'], 'counts': [0] * len(state['buckets']), 'sum': 0.0, 'count': 0})
+            merged['counts'] = [a + b for a, b in zip(merged['counts'], state['counts'])]
+            merged['sum'] += state['sum']
+            merged['count'] += state['count']
+    return counters, histograms
+
+
+def _as_snapshot(counters, histograms):
+    return {
+        'counters': [[name, labels, v] for (name, labels), v in counters.items()],
+        'histograms': [[name, labels, s] for (name, labels), s in histograms.items()],
+    }
+
+
+def _worker_pid(name):
+    # worker-<pid>-<id>.json
+    return int(name[len('worker-'):].split('-')[0].split('.')[0])
+
+
+def _pid_alive(pid):
+    if os.name == 'nt':
+        # os.kill() would terminate the process on Windows; keep the snapshot
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels(pairs, extra=()):
+    pairs = list(pairs) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render(snapshots):
+    counters, histograms = _merge(snapshots)
+    by_name = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append(f'{name}{_labels(labels)} {value}')
+    for (name, labels), state in histograms.items():
+        lines = by_name.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(state['buckets'], state['counts']):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels(labels, [("le", repr(float(bound)))])} {cumulative}')
+        lines.append(f'{name}_bucket{_labels(labels, [("le", "+Inf")])} {state["count"]}')
+        lines.append(f'{name}_sum{_labels(labels)} {state["sum"]:.6f}')
+        lines.append(f'{name}_count{_labels(labels)} {state["count"]}')
+    out = []
+    for name in sorted(by_name):
+        kind, text = HELP.get(name, ('untyped', ''))
+        out += [f'# HELP {name} {text}', f'# TYPE {name} {kind}', *sorted(by_name[name])]
+    return '\n'.join(out) + '\n'
+
+
+class Exporter:
+    """Writes this process's snapshot to the shared directory and reads all of them."""
+
+    def __init__(self, directory, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        self._last_flush = 0.0
+        self._pid = None
+        self._filename = None
+        os.makedirs(directory, exist_ok=True)
+
+    def flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.interval:
+            return
+        self._last_flush = now
+        if self._pid != os.getpid():
+            # New process (or forked child): a file of its own
+            self._pid = os.getpid()
+            self._filename = f'worker-{self._pid}-{uuid.uuid4().hex[:12]}.json'
+        self._write(self._filename, REGISTRY.snapshot())
+
+    def collect(self):
+        self.flush(force=True)
+        self._archive_dead_workers()
+        # A fold between reading the archive and the worker files would count
+        # a snapshot twice or not at all: retry until the archive is unchanged
+        while True:
+            archive = self._read(ARCHIVE_FILE) or {}
+            folded = set(archive.get('folded', ()))
+            snapshots = [snap for name, snap in self._worker_snapshots() if name not in folded]
+            if (self._read(ARCHIVE_FILE) or {}).get('generation') == archive.get('generation'):
+                break
+        if archive:
+            snapshots.append(archive)
+        return snapshots
+
+    def _archive_dead_workers(self):
+        """Fold snapshots of exited workers into the archive and remove them."""
+        names = [name for name in self._worker_names() if not _pid_alive(_worker_pid(name))]
+        if not names:
+            return
+        lock = os.path.join(self.directory, ARCHIVE_LOCK)
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            # Another worker is folding; the next scrape retries
+            try:
+                if time.time() - os.path.getmtime(lock) > ARCHIVE_LOCK_TIMEOUT:
+                    os.remove(lock)
+            except OSError:
+                pass
+            return
+        try:
+            archive = self._read(ARCHIVE_FILE) or {'counters': [], 'histograms': [], 'generation': 0}
+            # Files folded by a fold that stopped before removing them
+            for name in archive.get('folded', ()):
+                self._remove(name)
+            dead = [(name, snap) for name, snap in self._worker_snapshots() if name in names]
+            folded = [name for name, _ in dead]
+            merged = _as_snapshot(*_merge([archive, *(snap for _, snap in dead)]))
+            merged.update(generation=archive['generation'] + 1, folded=folded)
+            self._write(ARCHIVE_FILE, merged)
+            for name in folded:
+                self._remove(name)
+        finally:
+            self._remove(ARCHIVE_LOCK)
+
+    def _worker_names(self):
+        return [name for name in os.listdir(self.directory) if name.startswith('worker-') and name.endswith('.json')]
+
+    def _worker_snapshots(self):
+        for name in self._worker_names():
+            snap = self._read(name)
+            if snap is not None:
+                yield name, snap
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.directory, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, name, data):
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, os.path.join(self.directory, name))
+
+    def _remove(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def init_app(app, directory, slow_query_ms=None, token=None, public=False):
+    exporter = Exporter(directory)
+    atexit.register(exporter.flush, True)
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metrics_started = time.perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'metrics_started', None)
+        if started is None or not has_request_context():
+            return
+        elapsed = time.perf_counter() - started
+        g.sql_seconds = g.get('sql_seconds', 0.0) + elapsed
+        if slow_query_ms is not None and elapsed * 1000 >= slow_query_ms:
+            REGISTRY.inc('db_slow_queries_total', [('endpoint', request.endpoint or 'unmatched')])
+            app.logger.warning({
+                'event': 'slow_query',
+                'endpoint': request.endpoint,
+                'method': request.method,
+                'path': request.path,
+                'ms': round(elapsed * 1000, 1),
+                'statement': statement,
+            })
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def _remember_status(response):
+        g.response_status = response.status_code
+        return response
+
+    # Teardown runs after every after_request hook (compression included) and,
+    # for streamed responses, only once the stream is finished
+    @app.teardown_request
+    def _record_request(exc):
+        started = g.pop('request_started', None)
+        if started is None or request.endpoint == 'metrics':
+            return
+        endpoint = [('endpoint', request.endpoint or 'unmatched')]
+        status = str(g.get('response_status', 500))
+        REGISTRY.inc('http_requests_total', endpoint + [('method', request.method), ('status', status)])
+        REGISTRY.observe('http_request_duration_seconds', time.perf_counter() - started, LATENCY_BUCKETS, endpoint)
+        REGISTRY.observe('http_request_queries', g.get('query_count', 0), QUERY_COUNT_BUCKETS, endpoint)
+        REGISTRY.observe('http_request_sql_seconds', g.get('sql_seconds', 0.0), LATENCY_BUCKETS, endpoint)
+        exporter.flush()
+
+    # Scrapes need "Authorization: Bearer <token>"; without a token the
+    # endpoint is closed unless explicitly made public (private network)
+    @app.route('/metrics')
+    def metrics():
+        if not public:
+            if not token:
+                abort(404)
+            if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+                abort(401)
+        return Response(render(exporter.collect()), mimetype='text/plain; version=0.0.4')
+
+    return exporter
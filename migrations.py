@@ -0,0 +1,293 @@
+"""Versioned schema migrations.
+
+Applied versions are recorded in the `schema_version` table; each pending
+migration runs once, in order, inside its own transaction. Steps are written
+to be idempotent (add-if-missing, CREATE INDEX IF NOT EXISTS) so databases
+created before versioning existed are brought up to date safely.
+"""
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+
+def _quote(conn, name):
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _add_column(conn, table, column, ddl):
+    if column not in {c['name'] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f'ALTER TABLE {_quote(conn, table)} ADD COLUMN {column} {ddl}'))
+        return True
+    return False
+
+
+def _create_index(conn, name, table, columns, unique=False, using=None):
+    conn.execute(text(
+        f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS {name} '
+        f'ON {_quote(conn, table)} {f"USING {using} " if using else ""}({", ".join(columns)})'
+    ))
+
+
+def _legacy_columns(conn, metadata):
+    # Tables and columns the old import-time create_all()/ALTER block added
+    metadata.create_all(conn, checkfirst=True)
+    for column, ddl in (
+        ('r_age', 'VARCHAR(10)'),
+        ('time_on_project', 'VARCHAR(100)'),
+        ('previous_faction_experience', 'VARCHAR(200)'),
+        ('shooting_skills', 'VARCHAR(10)'),
+        ('knowledge_of_law', 'TEXT'),
+        ('passport_series', 'VARCHAR(10)'),
+        ('passport_number', 'VARCHAR(20)'),
+        ('email', 'VARCHAR(100)'),
+        ('roblox_nick', 'VARCHAR(100)'),
+        ('address', 'TEXT'),
+        ('education', 'VARCHAR(200)'),
+        ('work_experience', 'TEXT'),
+        ('live_in_area', 'VARCHAR(200)'),
+        ('ready_to_serve_the_country', 'VARCHAR(100)'),
+        ('military_rank', 'VARCHAR(50)'),
+        ('previous_service', 'TEXT'),
+        ('department_preference', 'VARCHAR(200)'),
+        ('additional_info', 'TEXT'),
+    ):
+        _add_column(conn, 'recruitment', column, ddl)
+    _add_column(conn, 'user', 'rank', 'VARCHAR(50)')
+    if _add_column(conn, 'user', 'unread_notifications', 'INTEGER NOT NULL DEFAULT 0'):
+        user = _quote(conn, 'user')
+        conn.execute(text(
+            f'UPDATE {user} SET unread_notifications = '
+            f'(SELECT COUNT(*) FROM notification WHERE notification.user_id = {user}.id AND NOT notification.is_read)'
+        ))
+
+
+def _hot_path_indexes(conn, metadata):
+    # Duplicate memberships would block the unique index; keep the oldest row
+    conn.execute(text(
+        'DELETE FROM group_member WHERE id NOT IN '
+        '(SELECT MIN(id) FROM group_member GROUP BY group_id, user_id)'
+    ))
+    _create_index(conn, 'uq_group_member_group_user', 'group_member', ['group_id', 'user_id'], unique=True)
+    _create_index(conn, 'ix_group_member_user_id', 'group_member', ['user_id'])
+    _create_index(conn, 'ix_combat_task_user_id_id', 'combat_task', ['user_id', 'id'])
+    _create_index(conn, 'ix_assignment_user_id_id', 'assignment', ['user_id', 'id'])
+    _create_index(conn, 'ix_notification_user_id_id', 'notification', ['user_id', 'id'])
+    _create_index(conn, 'ix_notification_user_id_is_read', 'notification', ['user_id', 'is_read'])
+    _create_index(conn, 'ix_day_schedule_user_id', 'day_schedule', ['user_id'])
+    _create_index(conn, 'ix_recruitment_submission_date_id', 'recruitment', ['submission_date', 'id'])
+    _create_index(conn, 'ix_recruitment_status_submission_date_id', 'recruitment', ['status', 'submission_date', 'id'])
+    _create_index(conn, 'ix_news_date_id', 'news', ['date', 'id'])
+    _create_index(conn, 'ix_job_status_id', 'job', ['status', 'id'])
+
+
+def _submission_idempotency_key(conn, metadata):
+    _add_column(conn, 'recruitment', 'idempotency_key', 'VARCHAR(64)')
+    _create_index(conn, 'uq_recruitment_idempotency_key', 'recruitment', ['idempotency_key'], unique=True)
+
+
+_FTS_COLUMNS = ['last_name', 'first_name', 'middle_name', 'roblox_nick', 'phone', 'knowledge_of_law', 'additional_info']
+
+
+def _digits_sql(expr):
+    # Phone numbers are indexed as bare digits so "+7 (999) 123-45-67" matches "7999123"
+    for ch in (' ', '-', '(', ')', '+', '.'):
+        expr = f"replace({expr}, '{ch}', '')"
+    return expr
+
+
+def _phone_forms_sql(digits, last):
+    # Full number, national number (last 10 digits, without the +7/8 prefix)
+    # and subscriber number (last 7), each a token matched by prefix: "999123"
+    # and "1234567" find "+7 (999) 123-45-67" as well as "7999123" does
+    return f"{digits} || ' ' || {last(digits, 10)} || ' ' || {last(digits, 7)}"
+
+
+def _fts_phone(expr):
+    return _phone_forms_sql(_digits_sql(expr), lambda digits, n: f'substr({digits}, -{n})')
+
+
+def _fts_values(prefix):
+    return ', '.join(_fts_phone(f'{prefix}.phone') if c == 'phone' else f'{prefix}.{c}' for c in _FTS_COLUMNS)
+
+
+_FTS_TRIGGERS = ('recruitment_fts_ai', 'recruitment_fts_ad', 'recruitment_fts_au')
+
+
+def _sync_sqlite_fts(conn):
+    # Triggers keep the contentless index in step with recruitment; the index
+    # is then rebuilt from the table with the current _fts_values
+    columns = ', '.join(_FTS_COLUMNS)
+    conn.execute(text(
+        f'CREATE TRIGGER IF NOT EXISTS recruitment_fts_ai AFTER INSERT ON recruitment BEGIN '
+        f'INSERT INTO recruitment_fts (rowid, {columns}) VALUES (new.id, {_fts_values("new")}); END'
+    ))
+    # Contentless tables remove a row via the 'delete' command with the indexed values
+    delete_old = (f"INSERT INTO recruitment_fts (recruitment_fts, rowid, {columns}) "
+                  f"VALUES ('delete', old.id, {_fts_values('old')});")
+    conn.execute(text(
+        f'CREATE TRIGGER IF NOT EXISTS recruitment_fts_ad AFTER DELETE ON recruitment BEGIN {delete_old} END'
+    ))
+    conn.execute(text(
+        f'CREATE TRIGGER IF NOT EXISTS recruitment_fts_au AFTER UPDATE OF {columns} ON recruitment BEGIN '
+        f'{delete_old} '
+        f'INSERT INTO recruitment_fts (rowid, {columns}) VALUES (new.id, {_fts_values("new")}); END'
+    ))
+    conn.execute(text("INSERT INTO recruitment_fts (recruitment_fts) VALUES ('delete-all')"))
+    conn.execute(text(
+        f'INSERT INTO recruitment_fts (rowid, {columns}) SELECT r.id, {_fts_values("r")} FROM recruitment r'
+    ))
+
+
+def _add_pg_search_vector(conn):
+    # Generated column: Postgres keeps it in sync on every insert/update
+    phone = _phone_forms_sql("regexp_replace(coalesce(phone, ''), '\\D', '', 'g')",
+                             lambda digits, n: f'right({digits}, {n})')
+    conn.execute(text(
+        "ALTER TABLE recruitment ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(last_name, '') || ' ' || coalesce(first_name, '') || ' ' "
+        "|| coalesce(middle_name, '') || ' ' || coalesce(roblox_nick, '') || ' ' "
+        f"|| {phone}), 'A') || "
+        "setweight(to_tsvector('russian', coalesce(knowledge_of_law, '') || ' ' || coalesce(additional_info, '')), 'B')"
+        ") STORED"
+    ))
+    _create_index(conn, 'ix_recruitment_search_vector', 'recruitment', ['search_vector'], using='gin')
+
+
+def _applications_search(conn, metadata):
+    if conn.dialect.name == 'sqlite':
+        columns = ', '.join(_FTS_COLUMNS)
+        # Contentless FTS5 table kept in sync by triggers; rowid = recruitment.id
+        conn.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS recruitment_fts USING fts5({columns}, "
+            f"content='', tokenize='unicode61 remove_diacritics 2')"
+        ))
+        _sync_sqlite_fts(conn)
+    elif conn.dialect.name == 'postgresql':
+        _add_pg_search_vector(conn)
+
+
+def _news_archive_index(conn, metadata):
+    _create_index(conn, 'ix_news_category_date_id', 'news', ['category', 'date', 'id'])
+
+
+def _schedule_templates(conn, metadata):
+    # Group schedules move to one row per group and day; rows already fanned
+    # out into day_schedule stay where they are and keep being shown
+    for table in ('schedule_template', 'schedule_override'):
+        metadata.tables[table].create(conn, checkfirst=True)
+    _create_index(conn, 'ix_schedule_template_group_id_id', 'schedule_template', ['group_id', 'id'])
+    _create_index(conn, 'uq_schedule_override_template_user', 'schedule_override', ['template_id', 'user_id'], unique=True)
+    _create_index(conn, 'ix_schedule_override_user_id', 'schedule_override', ['user_id'])
+
+
+def _rebuild_sqlite_table(conn, metadata, table):
+    # SQLite can't relax NOT NULL in place: recreate the table from the model
+    # (with its indexes) and copy the rows over
+    old = f'{table}__old'
+    conn.execute(text(f'ALTER TABLE {_quote(conn, table)} RENAME TO {old}'))
+    for index in inspect(conn).get_indexes(old):
+        conn.execute(text(f'DROP INDEX {index["name"]}'))
+    metadata.tables[table].create(conn)
+    columns = ', '.join(c['name'] for c in inspect(conn).get_columns(old))
+    conn.execute(text(f'INSERT INTO {_quote(conn, table)} ({columns}) SELECT {columns} FROM {old}'))
+    conn.execute(text(f'DROP TABLE {old}'))
+
+
+def _group_items(conn, metadata):
+    # Group rows carry group_id and no user_id
+    for table in ('combat_task', 'assignment', 'notification'):
+        if 'group_id' not in {c['name'] for c in inspect(conn).get_columns(table)}:
+            if conn.dialect.name == 'sqlite':
+                _rebuild_sqlite_table(conn, metadata, table)
+            else:
+                _add_column(conn, table, 'group_id', f'INTEGER REFERENCES {_quote(conn, "group")} (id)')
+                conn.execute(text(f'ALTER TABLE {_quote(conn, table)} ALTER COLUMN user_id DROP NOT NULL'))
+        _create_index(conn, f'ix_{table}_group_id_id', table, ['group_id', 'id'])
+    metadata.tables['group_item_state'].create(conn, checkfirst=True)
+    _create_index(conn, 'uq_group_item_state_item_user', 'group_item_state', ['item_type', 'item_id', 'user_id'], unique=True)
+    _create_index(conn, 'ix_group_item_state_user_id', 'group_item_state', ['user_id'])
+
+
+def _phone_search_forms(conn, metadata):
+    # Reindex phones with their national and subscriber forms (_phone_forms_sql)
+    if conn.dialect.name == 'sqlite':
+        for trigger in _FTS_TRIGGERS:
+            conn.execute(text(f'DROP TRIGGER IF EXISTS {trigger}'))
+        _sync_sqlite_fts(conn)
+    elif conn.dialect.name == 'postgresql':
+        # A generated column's expression can't be altered; dropping it drops its index
+        conn.execute(text('ALTER TABLE recruitment DROP COLUMN IF EXISTS search_vector'))
+        _add_pg_search_vector(conn)
+
+
+
+def _submission_fingerprint(conn, metadata):
+    # Keys stored before this have no fingerprint and are no longer replayed
+    _add_column(conn, 'recruitment', 'idempotency_fingerprint', 'VARCHAR(64)')
+
+
+# (version, name, step); append only, never renumber
+MIGRATIONS = [
+    (1, 'legacy_columns', _legacy_columns),
+    (2, 'hot_path_indexes', _hot_path_indexes),
+    (3, 'submission_idempotency_key', _submission_idempotency_key),
+    (4, 'applications_search', _applications_search),
+    (5, 'news_archive_index', _news_archive_index),
+    (6, 'schedule_templates', _schedule_templates),
+    (7, 'group_items', _group_items),
+    (8, 'phone_search_forms', _phone_search_forms),
+    (9, 'submission_fingerprint', _submission_fingerprint),
+]
+
+HEAD = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_version ('
+            'version INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, applied_at TIMESTAMP NOT NULL)'
+        ))
+
+
+def _record(conn, version, name):
+    conn.execute(
+        text('INSERT INTO schema_version (version, name, applied_at) VALUES (:v, :n, :t)'),
+        {'v': version, 'n': name, 't': datetime.utcnow()},
+    )
+
+
+def current_version(engine):
+    with engine.connect() as conn:
+        if not inspect(conn).has_table('schema_version'):
+            return None
+        return conn.execute(text('SELECT MAX(version) FROM schema_version')).scalar()
+
+
+def upgrade(engine, metadata):
+    """Bring the database to HEAD; returns the names of the migrations applied."""
+    version = current_version(engine)
+    if version is None:
+        app_tables = set(metadata.tables)
+        with engine.connect() as conn:
+            existing = set(inspect(conn).get_table_names())
+        applied = []
+        if not app_tables & existing:
+            # Fresh database: create the model tables, then run every step
+            # for what the models can't express (FTS tables, triggers)
+            with engine.begin() as conn:
+                metadata.create_all(conn)
+            applied.append('create_all')
+        _ensure_version_table(engine)
+        version = 0
+    else:
+        applied = []
+
+    for v, name, step in MIGRATIONS:
+        if v <= version:
+            continue
+        with engine.begin() as conn:
+            step(conn, metadata)
+            _record(conn, v, name)
+        applied.append(name)
+    return applied